@@ -0,0 +1,151 @@
+"""
+    Contains the object that stores the raw tables of a batch, so its output can be rebuilt
+"""
+
+import os
+import json
+import shutil
+
+from table_cache import save_tables, load_tables
+
+
+class BatchSnapshot:
+    """
+    Class that stores the target tables of every applicant in a batch
+
+    The tables are stored as each applicant is extracted, along with the order of the
+    applicants and their allocation to markers. This allows the workbook to be rebuilt
+    (e.g. after the mapping file is edited) without reading the pdfs again.
+
+    Once the tables of an applicant are written, its ID and any issue importing its pdf
+    are appended to a journal and flushed to disk. If the extraction stops part way, the
+    applicants in the journal have been stored in full, so a resumed batch only extracts
+    the others, and those added with retry set.
+    """
+
+    def __init__(self, path_to_snapshot):
+        self.path_to_snapshot = path_to_snapshot
+        self.path_to_info = os.path.join(self.path_to_snapshot, "snapshot.json")
+        self.path_to_journal = os.path.join(self.path_to_snapshot, "journal.jsonl")
+
+        self.journal = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def close(self):
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+
+    def start(self, applicant_ids, marker_allocation):
+        """
+        Starts a new snapshot, removing the previous one for the batch
+        """
+        if os.path.exists(self.path_to_snapshot):
+            shutil.rmtree(self.path_to_snapshot)
+        os.makedirs(self.path_to_snapshot)
+
+        with open(self.path_to_info, "w") as file:
+            json.dump(
+                {
+                    "applicant_ids": list(applicant_ids),
+                    "marker_allocation": marker_allocation,
+                },
+                file,
+            )
+
+        self.journal = open(self.path_to_journal, "a")
+
+    def resume(self, applicant_ids):
+        """
+        Continues the snapshot of an interrupted batch
+        Returns the applicants already stored, as in read_journal, and the allocation to
+        markers
+        """
+        snapshot_ids, marker_allocation = self.load_info()
+
+        if list(snapshot_ids) != list(applicant_ids):
+            raise ValueError(
+                f"Applicant IDs of the snapshot in {self.path_to_snapshot} don't match "
+                "this batch, so it can't be resumed"
+            )
+
+        finished_ids = self.read_journal(skip_retried=True)
+
+        self.journal = open(self.path_to_journal, "a")
+
+        return finished_ids, marker_allocation
+
+    def read_journal(self, skip_retried=False):
+        """
+        Returns a dict of the ID of each applicant in the journal to its issue importing
+        If skip_retried, the applicants to extract again when resuming are left out
+        """
+        finished_ids = dict()
+
+        if not os.path.exists(self.path_to_journal):
+            return finished_ids
+
+        with open(self.path_to_journal, "rb+") as file:
+            contents = file.read()
+
+            # Last line is incomplete if the batch stopped while it was written
+            # => removed, so the next record starts on a new line
+            end = contents.rfind(b"\n") + 1
+            file.truncate(end)
+
+        for line in contents[:end].decode().splitlines():
+            record = json.loads(line)
+
+            # Latest record of an applicant is the one that counts
+            if skip_retried and record.get("retry"):
+                finished_ids.pop(record["applicant_id"], None)
+            else:
+                finished_ids[record["applicant_id"]] = record.get("issue")
+
+        return finished_ids
+
+    def get_student_path(self, app_id):
+        return os.path.join(self.path_to_snapshot, str(app_id))
+
+    def add_student(
+        self, app_id, grade_tables, grade_counters, found_exit, issue=None, retry=False
+    ):
+        student_path = self.get_student_path(app_id)
+
+        # Left by an interrupted batch before the applicant reached the journal
+        if os.path.exists(student_path):
+            shutil.rmtree(student_path)
+
+        save_tables(student_path, grade_tables, grade_counters, found_exit)
+
+        if self.journal is not None:
+            record = {"applicant_id": app_id, "issue": issue}
+            if retry:
+                record["retry"] = True
+            self.journal.write(json.dumps(record) + "\n")
+            self.journal.flush()
+            os.fsync(self.journal.fileno())
+
+    def load_info(self):
+        """
+        Returns the applicant IDs, in order, and the allocation of applicants to markers
+        """
+        if not os.path.exists(self.path_to_info):
+            raise FileNotFoundError(f"No snapshot found in {self.path_to_snapshot}")
+
+        with open(self.path_to_info, "r") as file:
+            info = json.load(file)
+
+        return info["applicant_ids"], info["marker_allocation"]
+
+    def load_student(self, app_id):
+        """
+        Returns the tables, header counters and exit flag stored for an applicant
+        """
+        return load_tables(self.get_student_path(app_id))
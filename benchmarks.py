@@ -0,0 +1,844 @@
+"""
+    File to time the parts of the extraction that don't need the pdfs, on synthetic data
+
+    Run all benchmarks,
+        python benchmarks.py
+    or only some of them,
+        python benchmarks.py workbook
+"""
+
+import os
+import sys
+import copy
+import time
+import random
+import tempfile
+import subprocess
+import tracemalloc
+
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from pdf_strings import raw_table_headers
+
+# Qualifications as they appear in the pdfs, and as they are mapped internally
+RAW_QUALIFICATIONS = {
+    "GCE Advanced Level": "United Kingdom: A Levels",
+    "GCE AS Level": "United Kingdom: AS Levels",
+    "International Baccalaureate Diploma": "World: IB - International Baccalaureate (IB) Diploma",
+    "IB Total points": "IB Total points",
+    "Baccalaureat General": "France: French Baccalaureate Scientific stream",
+    "Abitur": "Germany: Abiturprufung",
+}
+MATH_MAPPING = {
+    "United Kingdom: A Levels": {"Mathematics", "Maths"},
+    "World: IB - International Baccalaureate (IB) Diploma": {"Mathematics: analysis and approaches"},
+    "France: French Baccalaureate Scientific stream": {"Mathematiques"},
+    "Germany: Abiturprufung": {"Mathematik"},
+}
+PHYS_MAPPING = {
+    "United Kingdom: A Levels": {"Physics"},
+    "World: IB - International Baccalaureate (IB) Diploma": {"Physics"},
+    "France: French Baccalaureate Scientific stream": {"Physique-Chimie"},
+    "Germany: Abiturprufung": {"Physik"},
+}
+FM_MAPPING = {"United Kingdom: A Levels": {"Further Mathematics"}}
+
+SUBJECTS = [
+    "Mathematics",
+    "Maths",
+    "Physics",
+    "Further Mathematics",
+    "Chemistry",
+    "Biology",
+    "Mathematik",
+    "Physik",
+    "Physique-Chimie",
+    "Mathematiques",
+    "Physics Stand Lvl",
+    "Extended Essay",
+]
+GRADES = ["A*", "A", "B", 7, 6, "6H", "5S", "A (Pass)", np.nan]
+MODULES = [
+    "Title: Mathematics: analysis and approaches Grade: 7H Date: 2020",
+    "Title: Physics Predicted Grade: 6 Date: 2020",
+    "Title: Chemistry Value: 5 Date: 2021",
+    "Title: Extended Essay Grade: A Date: 2020",
+    "Title: English Date: 2020",
+]
+
+
+def get_internal_mapping():
+    from mappings import QualificationMapping, normalise_qualification
+
+    return QualificationMapping(
+        {normalise_qualification(key): value for key, value in RAW_QUALIFICATIONS.items()}
+    )
+
+
+def make_table(rng, headers, num_entries):
+    """
+    Returns a target table with random entries, some followed by their module details
+    """
+    rows = []
+    for _ in range(num_entries):
+        row = [np.nan] * len(headers)
+        row[headers.index("Date")] = rng.choice(["06-2019", "06-2020", "07-2021"])
+        row[headers.index("Body")] = "AQA"
+        if "Exam" in headers:
+            row[headers.index("Exam")] = rng.choice(list(RAW_QUALIFICATIONS))
+        else:
+            row[headers.index("Exam Level")] = rng.choice(list(RAW_QUALIFICATIONS))
+        row[headers.index("Subject")] = rng.choice(SUBJECTS)
+        row[headers.index("Grade")] = rng.choice(GRADES)
+        rows.append(row)
+
+        # Module details of the qualification above
+        if rng.random() < 0.2:
+            row = [np.nan] * len(headers)
+            row[0] = "Module Details/Unit Grades"
+            row[1] = "06-2020 " + " ".join(
+                rng.choice(MODULES) for _ in range(rng.randint(1, 6))
+            )
+            rows.append(row)
+
+    return pd.DataFrame(rows, columns=headers)
+
+
+def make_grade_tables(rng, num_entries=None):
+    """
+    Returns target tables shaped like the ones read from a pdf, with random entries
+    """
+    grade_tables = []
+    grade_counters = []
+
+    for headers in raw_table_headers():
+        grade_tables.append(make_table(rng, headers, num_entries or rng.randint(1, 8)))
+        grade_counters.append(Counter(headers))
+
+    return grade_tables, grade_counters
+
+
+def make_students(num_students, num_templates=200, seed=0):
+    """
+    Returns students built from synthetic tables
+    Only num_templates students are built, and copied with new IDs to reach num_students
+    """
+    from student import Student
+
+    rng = random.Random(seed)
+    internal_mapping = get_internal_mapping()
+
+    templates = []
+    for index in range(min(num_templates, num_students)):
+        grade_tables, grade_counters = make_grade_tables(rng)
+        templates.append(
+            Student(str(1000000000 + index), grade_tables, grade_counters, internal_mapping)
+        )
+
+    students = []
+    for index in range(num_students):
+        student = copy.copy(templates[index % len(templates)])
+        student.unique_id = str(1000000000 + index)
+        students.append(student)
+
+    return students
+
+
+def get_marker_allocation(applicant_ids):
+    # Same split as assign_students_to_marker, without writing the ID files
+    half = len(applicant_ids) // 2
+    return {"AA1": applicant_ids[:half], "BB1": applicant_ids[half:]}
+
+
+def measure(function, *args):
+    """
+    Returns the time taken by a call, in seconds, and the peak memory it allocated, in MB
+    The time includes the overhead of tracing the memory
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+
+    function(*args)
+
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return elapsed, peak / 1024 ** 2
+
+
+def write_workbook_by_cell(all_students, students, path_to_output):
+    """
+    Workbook written as before: every cell set through ws.cell in an in-memory workbook
+    """
+    from openpyxl import Workbook
+
+    wb = Workbook()
+    sheets = [
+        (wb.create_sheet("Completed Qualifications"), "completed"),
+        (wb.create_sheet("Predicted Grades"), "predicted"),
+        (wb.create_sheet("Exam Results"), "results"),
+    ]
+    compiled = wb.create_sheet("Compiled", 0)
+
+    header = all_students.populate_normal_header()
+    for ws, _ in sheets:
+        for column, value in enumerate(header, 1):
+            ws.cell(row=1, column=column, value=value)
+    for column, value in enumerate(all_students.populate_master_header(), 1):
+        compiled.cell(row=1, column=column, value=value)
+
+    for row_counter, student in enumerate(students, 2):
+        for ws, desired_data in sheets:
+            row = all_students.populate_worksheet(student, desired_data)
+            for column, value in enumerate(row, 1):
+                ws.cell(row=row_counter, column=column, value=value)
+        for column, value in enumerate(all_students.compile_for_master(student), 1):
+            compiled.cell(row=row_counter, column=column, value=value)
+
+    wb.save(path_to_output)
+
+
+def write_workbook_streamed(all_students, students, output_folder):
+    for counter, student in enumerate(students):
+        all_students.add_student_sequentially(student, counter)
+
+    all_students.write_to_excel(output_folder)
+
+
+def benchmark_workbook(sizes=(10000, 100000)):
+    """
+    Time and peak memory to write the grades workbook, cell by cell vs write-only
+    """
+    from extracted_students import ExtractedStudents
+
+    for num_students in sizes:
+        students = make_students(num_students)
+        applicant_ids = [student.unique_id for student in students]
+        marker_allocation = get_marker_allocation(applicant_ids)
+
+        with tempfile.TemporaryDirectory() as output_folder:
+            all_students = ExtractedStudents(
+                applicant_ids, MATH_MAPPING, PHYS_MAPPING, FM_MAPPING, marker_allocation
+            )
+            by_cell = measure(
+                write_workbook_by_cell,
+                all_students,
+                students,
+                os.path.join(output_folder, "by_cell.xlsx"),
+            )
+
+            all_students = ExtractedStudents(
+                applicant_ids, MATH_MAPPING, PHYS_MAPPING, FM_MAPPING, marker_allocation
+            )
+            streamed = measure(write_workbook_streamed, all_students, students, output_folder)
+
+        print(f"workbook, {num_students} students")
+        print("    {:<12}: {:8.2f} s {:10.1f} MB".format("by cell", *by_cell))
+        print("    {:<12}: {:8.2f} s {:10.1f} MB".format("write-only", *streamed))
+
+
+def sort_into_subjects_by_sets(student, math_mapping, physics_mapping, fm_mapping):
+    """
+    Entries sorted as before: a new set of lowercase subjects per entry and mapping
+    """
+    from utils import escape_backslash_r
+
+    categorised_entries = {
+        "math": [],
+        "physics": [],
+        "fm": [],
+        "additional_subjects": [],
+    }
+
+    for grade_entries in student.which_grades.values():
+        for entry in grade_entries:
+            if escape_backslash_r(entry.subject).lower() in {s.lower() for s in math_mapping.get(entry.qualification, set())}:
+                categorised_entries["math"].append(entry)
+            elif escape_backslash_r(entry.subject).lower() in {s.lower() for s in physics_mapping.get(entry.qualification, set())}:
+                categorised_entries["physics"].append(entry)
+            elif escape_backslash_r(entry.subject).lower() in {s.lower() for s in fm_mapping.get(entry.qualification, set())}:
+                categorised_entries["fm"].append(entry)
+            else:
+                categorised_entries["additional_subjects"].append(entry)
+
+    return categorised_entries
+
+
+def benchmark_subjects(num_students=20000, subjects_per_qualification=200):
+    """
+    Time to sort the entries of every student into subjects, sets per entry vs compiled index
+
+    The sheets of a real mapping file list many subject names per qualification, so
+    subjects_per_qualification filler names are added to each qualification.
+    """
+    from extracted_students import ExtractedStudents
+    from mappings import SubjectCategories
+
+    students = make_students(num_students)
+
+    mappings = []
+    for mapping in (MATH_MAPPING, PHYS_MAPPING, FM_MAPPING):
+        mappings.append(
+            {
+                qualification: subjects
+                | {f"Subject {index}" for index in range(subjects_per_qualification)}
+                for qualification, subjects in mapping.items()
+            }
+        )
+
+    start = time.perf_counter()
+    for student in students:
+        sort_into_subjects_by_sets(student, *mappings)
+    by_sets = time.perf_counter() - start
+
+    start = time.perf_counter()
+    subject_categories = SubjectCategories(*mappings)
+    for student in students:
+        ExtractedStudents.sort_into_subjects(student, subject_categories)
+    compiled = time.perf_counter() - start
+
+    print(f"subjects, {num_students} students")
+    print("    {:<12}: {:8.3f} s".format("sets", by_sets))
+    print("    {:<12}: {:8.3f} s".format("compiled", compiled))
+
+
+def get_row_wise_student_class():
+    """
+    Student that converts its tables row by row as before, looking up every cell
+    """
+    from pandas import isna
+
+    from grade_entry import GradeEntry
+    from student import Student
+
+    class RowWiseStudent(Student):
+        def row_entries(self, table, row, qualification, grade, predicted, exam):
+            if self.is_qual_valid(qualification):
+                return [
+                    GradeEntry(
+                        self.get_valid_qualification(qualification),
+                        table["Subject"][row],
+                        grade,
+                        predicted,
+                        table["Date"][row].split("-")[-1],
+                        exam,
+                    )
+                ]
+            return []
+
+        def completed_grade_entries(self):
+            if self.completed_qualifications is None:
+                return None
+
+            table = self.completed_qualifications
+            for row in table.index:
+                if self.is_qual_valid(table["Exam"][row]):
+                    self.completed_entries += self.row_entries(
+                        table, row, table["Exam"][row], table["Grade"][row], False, False
+                    )
+                elif self.is_detailed_entry(table, row):
+                    self.completed_entries += self.handle_detailed_entry(table, row)
+
+            return self.completed_entries
+
+        def examresult_entries(self):
+            if self.exam_results is None:
+                return None
+
+            table = self.exam_results
+            for row in table.index:
+                if self.is_qual_valid(table["Exam Level"][row]):
+                    self.results_entries += self.row_entries(
+                        table, row, table["Exam Level"][row], table["Grade"][row], False, True
+                    )
+                elif self.is_detailed_entry(table, row):
+                    self.results_entries += self.handle_detailed_entry(table, row)
+
+            return self.results_entries
+
+        def predicted_grade_entries(self):
+            if self.uncompleted_qualifications is None:
+                return None
+
+            table = self.uncompleted_qualifications
+            for row in table.index:
+                is_pred_grade = isna(table["Predicted\rGrade"][row])
+                is_grade = isna(table["Grade"][row])
+
+                if is_pred_grade and is_grade:
+                    if self.is_detailed_entry(table, row):
+                        self.predicted_entries += self.handle_detailed_entry(table, row)
+                    continue
+
+                if not is_pred_grade and (
+                    is_grade or "Unnamed" in str(table["Grade"][row])
+                ):
+                    valid_grade = table["Predicted\rGrade"][row]
+                else:
+                    valid_grade = table["Grade"][row]
+
+                if isna(table["Exam"][row]):
+                    qualification = table["Body"][row]
+                else:
+                    qualification = table["Exam"][row]
+
+                self.predicted_entries += self.row_entries(
+                    table, row, qualification, valid_grade, True, False
+                )
+
+            return self.predicted_entries
+
+    return RowWiseStudent
+
+
+def benchmark_entries(sizes=(1000, 10000), repeat=3):
+    """
+    Time to convert the target tables into grade entries, row by row vs column-wise
+    """
+    from student import Student
+
+    internal_mapping = get_internal_mapping()
+    student_classes = (("row-wise", get_row_wise_student_class()), ("column-wise", Student))
+
+    for num_entries in sizes:
+        grade_tables, grade_counters = make_grade_tables(random.Random(0), num_entries)
+
+        print(f"entries, {num_entries} rows per table")
+
+        all_entries = []
+        for name, student_class in student_classes:
+            times = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                student = student_class(
+                    "1000000000", grade_tables, grade_counters, internal_mapping
+                )
+                times.append(time.perf_counter() - start)
+
+            entries = [
+                (entry.qualification, entry.year, *entry.grade_info)
+                for grade_entries in student.which_grades.values()
+                for entry in grade_entries
+            ]
+            all_entries.append(entries)
+
+            print(
+                "    {:<12}: {:8.3f} s for {} entries".format(name, min(times), len(entries))
+            )
+
+        assert all_entries[0] == all_entries[-1], "Entries differ from the row-wise student"
+
+
+class DictGradeEntry:
+    """
+    Grade entry as before: an instance __dict__, a grade_info list and no shared strings
+    """
+
+    def __init__(
+        self, qualification, subject, grade, is_predicted, year, is_exam_result
+    ):
+        from utils import escape_backslash_r
+
+        if isinstance(grade, str):
+            self.grade = escape_backslash_r(grade)
+        else:
+            self.grade = grade
+        self.subject = escape_backslash_r(subject)
+        self.qualification = escape_backslash_r(qualification)
+        self.is_predicted = is_predicted
+        self.is_exam_result = is_exam_result
+        self.year = year
+
+        self.grade_info = [self.grade, self.subject]
+
+
+def make_entry_values(num_entries, seed=0):
+    """
+    Returns the arguments of num_entries grade entries
+    Every string is a new object, as for cells read from separate tables
+    """
+    rng = random.Random(seed)
+
+    values = []
+    for _ in range(num_entries):
+        values.append(
+            (
+                "".join(rng.choice(list(RAW_QUALIFICATIONS.values()))),
+                "".join(rng.choice(SUBJECTS)),
+                "".join(rng.choice(["A*", "A", "B", "7", "6"])),
+                rng.random() < 0.5,
+                "".join(rng.choice(["2019", "2020", "2021"])),
+                False,
+            )
+        )
+
+    return values
+
+
+def get_bytes_per_entry(entry_class, values):
+    """
+    Memory held by the entries built from values, per entry, in bytes
+    """
+    tracemalloc.start()
+
+    entries = [entry_class(*value) for value in values]
+
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return current / len(entries)
+
+
+def benchmark_grade_entries(num_entries=200000):
+    """
+    Memory held per grade entry, __dict__ and grade_info list vs __slots__ and interned strings
+    """
+    from grade_entry import GradeEntry
+
+    values = make_entry_values(num_entries)
+
+    print(f"grade entries, {num_entries} entries")
+    for name, entry_class in (("dict", DictGradeEntry), ("slots", GradeEntry)):
+        print(
+            "    {:<12}: {:8.1f} bytes per entry".format(
+                name, get_bytes_per_entry(entry_class, values)
+            )
+        )
+
+
+def order_pdfs_by_argwhere(target_ids, pdf_paths, pdf_ids):
+    """
+    PDFs filtered and ordered as before: the IDs are searched for in arrays
+    """
+    target_ids = np.asarray(target_ids)
+
+    not_in_target = list(set(pdf_ids) - set(target_ids.tolist()))
+    extra_locs = [np.argwhere(np.asarray(pdf_ids) == id) for id in not_in_target]
+
+    pdf_ids = [pdf_ids[i] for i in range(0, len(pdf_ids)) if i not in extra_locs]
+    pdf_paths = [pdf_paths[i] for i in range(0, len(pdf_paths)) if i not in extra_locs]
+
+    id_locs = [
+        np.argwhere(target_ids == current_id).item()
+        for current_id in pdf_ids
+        if current_id in target_ids
+    ]
+
+    return [path for _, path in sorted(zip(id_locs, pdf_paths), key=lambda pair: pair[0])]
+
+
+def benchmark_order_pdfs(sizes=(5000, 50000), num_extra=100):
+    """
+    Time to filter the pdfs to the target IDs and put them in their order
+    """
+    from unittest.mock import patch
+
+    from utils import order_pdfs_to_target_id_input
+
+    rng = random.Random(0)
+
+    for num_ids in sizes:
+        target_ids = rng.sample(range(10**8, 10**9), num_ids + num_extra)
+        pdf_ids = target_ids[num_extra:] + target_ids[:num_extra]
+        target_ids = target_ids[num_extra:]
+        rng.shuffle(pdf_ids)
+        rng.shuffle(target_ids)
+        pdf_paths = [f"{id}.pdf" for id in pdf_ids]
+
+        start = time.perf_counter()
+        by_argwhere = order_pdfs_by_argwhere(target_ids, pdf_paths, pdf_ids)
+        argwhere = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with patch("utils.check_ids_correspond", return_value=target_ids):
+            by_dict, _ = order_pdfs_to_target_id_input(pdf_paths, pdf_ids)
+        indexed = time.perf_counter() - start
+
+        assert by_dict == by_argwhere
+
+        print(f"order_pdfs, {num_ids} IDs and {num_extra} extra pdfs")
+        print("    {:<12}: {:8.3f} s".format("argwhere", argwhere))
+        print("    {:<12}: {:8.3f} s".format("dict", indexed))
+
+
+def get_files_and_ids_by_listdir(abs_path):
+    """
+    Files listed and their repeated IDs removed as before
+    """
+    import logging
+
+    import settings
+    from utils import is_file_valid
+
+    lst_of_paths = []
+    for file in os.listdir(abs_path):
+        if is_file_valid(file):
+            lst_of_paths.append(os.path.join(abs_path, file))
+        else:
+            logging.info(f"{file} is not valid. Unicode or .pdf not in file name")
+    lst_of_paths = list(set(lst_of_paths))
+
+    lst_of_ids = [
+        os.path.basename(file).split(settings.pdf_filename_split_delimeter)[
+            settings.pdf_filename_split_index
+        ]
+        for file in lst_of_paths
+    ]
+
+    counter = 1
+    for unique_id in lst_of_ids[1:]:
+        if unique_id in lst_of_ids[:counter]:
+            lst_of_ids.pop(counter)
+            lst_of_paths.pop(counter)
+        else:
+            counter += 1
+
+    return lst_of_paths, lst_of_ids
+
+
+def benchmark_index_pdfs(sizes=(5000, 50000), num_repeated=500, num_invalid=500):
+    """
+    Time to list the pdfs of a folder and remove repeated IDs
+    """
+    from contextlib import redirect_stdout
+
+    from utils import index_pdf_folder
+
+    rng = random.Random(0)
+
+    for num_ids in sizes:
+        ids = rng.sample(range(10**9, 10**10), num_ids)
+        filenames = [f"Applicant_unicode_{id}_form.pdf" for id in ids]
+        filenames += [f"Copy_unicode_{id}_form.pdf" for id in ids[:num_repeated]]
+        filenames += [f"Applicant_ascii_{id}_form.pdf" for id in ids[:num_invalid]]
+
+        with tempfile.TemporaryDirectory() as folder:
+            for filename in filenames:
+                open(os.path.join(folder, filename), "wb").close()
+
+            with redirect_stdout(None):
+                start = time.perf_counter()
+                _, listed_ids = get_files_and_ids_by_listdir(folder)
+                listdir = time.perf_counter() - start
+
+                start = time.perf_counter()
+                pdf_index = index_pdf_folder(folder)
+                scandir = time.perf_counter() - start
+
+        assert sorted(listed_ids) == sorted(pdf_index)
+
+        print(f"index_pdfs, {num_ids} IDs and {num_repeated} repeated files")
+        print("    {:<12}: {:8.3f} s".format("listdir", listdir))
+        print("    {:<12}: {:8.3f} s".format("scandir", scandir))
+
+
+def benchmark_id_database(num_previous=(20000, 200000), num_new=5000):
+    """
+    Time to find the new IDs of a batch, reading the CSV database vs querying the database
+    """
+    import csv
+
+    import settings
+    from id_database import IdDatabase, read_csv_rows
+
+    rng = random.Random(0)
+
+    for num_ids in num_previous:
+        previous_ids = rng.sample(range(10**9, 10**10), num_ids + num_new)
+        new_ids = previous_ids[num_ids:]
+        previous_ids = previous_ids[:num_ids]
+        # Cumulative banner => target holds every ID of the cycle
+        target_ids = previous_ids + new_ids
+
+        with tempfile.TemporaryDirectory() as folder:
+            path_to_csv = os.path.join(folder, "previously_extracted.csv")
+            with open(path_to_csv, "w", newline="") as file:
+                writer = csv.writer(file)
+                writer.writerow(settings.database_headers)
+                writer.writerows(
+                    [id_num, 1 + index // 1000, "2021-01-01 00:00"]
+                    for index, id_num in enumerate(previous_ids)
+                )
+
+            start = time.perf_counter()
+            migrated = IdDatabase(path_to_csv)
+            migrated.close()
+            migration = time.perf_counter() - start
+
+            start = time.perf_counter()
+            rows = read_csv_rows(path_to_csv)
+            database_ids = {row[0] for row in rows}
+            max(row[1] for row in rows)
+            by_csv = set(target_ids) - database_ids
+            not_in_target_by_csv = database_ids - set(target_ids)
+            from_csv = time.perf_counter() - start
+
+            start = time.perf_counter()
+            with IdDatabase(path_to_csv) as id_database:
+                id_database.get_max_batch_number()
+                by_query, not_in_target_by_query = id_database.compare_ids(target_ids)
+            from_sqlite = time.perf_counter() - start
+
+        assert by_csv == by_query == set(new_ids)
+        assert not_in_target_by_csv == not_in_target_by_query
+
+        print(f"id_database, {num_ids} previous IDs and {num_new} new IDs")
+        print("    {:<12}: {:8.3f} s".format("csv", from_csv))
+        print("    {:<12}: {:8.3f} s".format("sqlite", from_sqlite))
+        print("    {:<12}: {:8.3f} s".format("migration", migration))
+
+
+def benchmark_distribution(num_files=2000, file_bytes=200000):
+    """
+    Time to place the pdfs in the marker folders and the pool, copying them one at a time
+    vs each mode of FileDistributor
+    """
+    import shutil
+
+    from file_distribution import DISTRIBUTION_MODES, FileDistributor
+    from utils import get_pdf_file
+
+    print(f"distribution, {num_files} files of {file_bytes} bytes")
+
+    with tempfile.TemporaryDirectory() as folder:
+        source_folder = os.path.join(folder, "pdfs")
+        os.makedirs(source_folder)
+
+        sources = []
+        for index in range(num_files):
+            source = os.path.join(source_folder, f"Applicant_unicode_{index}_form.pdf")
+            with open(source, "wb") as file:
+                file.write(os.urandom(file_bytes))
+            sources.append(source)
+
+        pdf_files = [get_pdf_file(source) for source in sources]
+
+        for name in ("sequential",) + DISTRIBUTION_MODES:
+            output_folder = os.path.join(folder, name)
+            marker_folder = os.path.join(output_folder, "marker")
+            pool = os.path.join(output_folder, "pool")
+            os.makedirs(marker_folder)
+            os.makedirs(pool)
+
+            start = time.perf_counter()
+            if name == "sequential":
+                for source in sources:
+                    shutil.copy(source, marker_folder)
+                for source in sources:
+                    shutil.copy(source, pool)
+            else:
+                with FileDistributor(name, 4, 8) as distributor:
+                    for pdf_file in pdf_files:
+                        distributor.submit(pdf_file, marker_folder)
+                        distributor.submit(pdf_file, pool)
+            elapsed = time.perf_counter() - start
+
+            shutil.rmtree(output_folder)
+
+            print("    {:<12}: {:8.3f} s".format(name, elapsed))
+
+
+def benchmark_timing(num_spans=100000):
+    """
+    Time added by recording a timing span, e.g. around each page read by tabula
+    """
+    import settings
+    from timing import span, timings
+
+    start = time.perf_counter()
+    for _ in range(num_spans):
+        pass
+    baseline = time.perf_counter() - start
+
+    for record_timings in (False, True):
+        settings.record_timings = record_timings
+        timings.restart()
+
+        start = time.perf_counter()
+        for page in range(num_spans):
+            with span("tabula_page", "Applicant_unicode_1_form.pdf", page):
+                pass
+        elapsed = time.perf_counter() - start - baseline
+
+        name = "recorded" if record_timings else "disabled"
+        print(f"timing, {num_spans} spans {name}")
+        print("    {:<12}: {:8.3f} us per span".format("span", 1e6 * elapsed / num_spans))
+
+    timings.restart()
+
+
+def get_import_time(module):
+    """
+    Cumulative import time of a module in a new interpreter, in seconds, from -X importtime
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].strip() == module:
+            return int(fields[1]) / 1e6
+
+    return None
+
+
+def get_run_time(arguments, repeat=5):
+    """
+    Best wall time of a command in a new interpreter, in seconds
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable] + arguments,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            check=True,
+        )
+        times.append(time.perf_counter() - start)
+
+    return min(times)
+
+
+def benchmark_startup():
+    """
+    Time to import the modules of the scripts, and to run them with --help
+    """
+    print("startup, import time")
+    for module in ("settings", "utils", "extracted_students", "student", "extraction"):
+        print("    {:<22}: {:8.3f} s".format(module, get_import_time(module)))
+
+    print("startup, --help")
+    for script in ("extract_table.py", "extract_subject_names.py", "rebuild_workbook.py"):
+        print("    {:<26}: {:8.3f} s".format(script, get_run_time([script, "--help"])))
+
+
+BENCHMARKS = {
+    "workbook": benchmark_workbook,
+    "subjects": benchmark_subjects,
+    "entries": benchmark_entries,
+    "grade_entries": benchmark_grade_entries,
+    "order_pdfs": benchmark_order_pdfs,
+    "index_pdfs": benchmark_index_pdfs,
+    "id_database": benchmark_id_database,
+    "distribution": benchmark_distribution,
+    "timing": benchmark_timing,
+    "startup": benchmark_startup,
+}
+
+if __name__ == "__main__":
+
+    names = sys.argv[1:] or list(BENCHMARKS)
+
+    for name in names:
+        BENCHMARKS[name]()
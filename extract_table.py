@@ -2,171 +2,284 @@
     File extract table of grades from UCAS forms
 """
 
-import subprocess
-
-from collections import Counter
-from tqdm import tqdm
-
+import csv
+import argparse
 import logging
-import tabula
 
 from utils import (
     check_output_dirs_exist,
-    copy_file,
-    copy_pdfs_to_pool,
+    get_marker_file_path,
     get_current_time,
-    get_subject_mapping,
     initialise_logger,
-    fix_broken_table,
     get_files_and_ids,
     update_previous_id_database,
-    get_internal_mapping,
+    load_mappings,
+    order_pdfs_to_snapshot_ids,
     order_pdfs_to_target_id_input,
 )
-from pdf_strings import (
-    desired_tables,
-    get_exit_string,
-)
-from extracted_students import ExtractedStudents
-from student import Student
+from pipeline import run_in_background
+from timing import span, timings
 import settings
 
-initialise_logger()
 
-PATH_TO_FILES = settings.path_to_pdfs_to_extract
-INTERNAL_MAPPING = get_internal_mapping(
-    settings.path_to_mapping_file, settings.qualification_mapping_sheet_name
-)
-MATH_MAPPING = get_subject_mapping(settings.path_to_mapping_file, settings.maths_mapping_sheet_name)
-PHYS_MAPPING = get_subject_mapping(settings.path_to_mapping_file, settings.physics_mapping_sheet_name)
-FM_MAPPING = get_subject_mapping(settings.path_to_mapping_file, settings.further_maths_mapping_sheet_name)
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+        description="Extracts the tables of grades from the UCAS pdfs of a batch. "
+        "All other inputs are set in settings.py"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=settings.num_workers,
+        help="number of processes used to extract tables (default: num_workers in settings.py)",
+    )
 
-# Generates full path to the files to extract data from
-# Extracts unique IDs from file name
-ALL_FILES, APPLICANT_IDS = get_files_and_ids(PATH_TO_FILES)
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="continue an interrupted batch, only extracting the pdfs not in its snapshot",
+    )
 
-# From the PDFs, these are the headers of the tables we want
-# They have been placed in a counter for easy comparison
-TARGET_TABLES = desired_tables()
-# First table after the desired ones that always occur
-EXIT_STRING = get_exit_string()
+    arguments = parser.parse_args()
 
-if __name__ == "__main__":
+    if arguments.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    return arguments
+
+
+def add_finished_students(extracted, all_files, applicant_ids, finished_ids, snapshot):
+    """
+    Stage that puts the applicants finished before a batch was interrupted back in order,
+    loading their tables from the snapshot
+    """
+    extracted = iter(extracted)
+
+    for pdf_file, app_id in zip(all_files, applicant_ids):
+        if app_id in finished_ids:
+            grade_tables, grade_counters, found_exit = snapshot.load_student(app_id)
+            issue = finished_ids[app_id]
+            yield pdf_file.path, app_id, grade_tables, grade_counters, found_exit, issue, True
+        else:
+            yield next(extracted) + (False,)
+
+
+def build_students(extracted, snapshot, tally, internal_mapping):
+    """
+    Stage that turns the tables of each pdf into a Student
+    The tables are not kept after this stage
+    """
+    from student import Student
+    from extraction import get_quarantine_issue
+
+    # A pdf over the time allowed may only have been slow because of the load at the time
+    # => it is extracted again if the batch is resumed
+    time_issue = get_quarantine_issue("time")
+
+    for file, app_id, grade_tables, grade_counters, found_exit, issue, is_finished in extracted:
+
+        # Quarantined pdfs are already logged
+        if not found_exit and issue is None:
+            logging.warning("EOF reached before exit condition")
+            logging.warning(f"Check file with ID: {app_id}")
+
+        # Finished applicants are already in the snapshot
+        if not is_finished:
+            with span("snapshot", file):
+                snapshot.add_student(
+                    app_id,
+                    grade_tables,
+                    grade_counters,
+                    found_exit,
+                    issue,
+                    retry=issue == time_issue,
+                )
+
+        if tally is not None:
+            tally.add_tables(grade_tables, grade_counters)
+
+        with span("build_student", file):
+            student = Student(app_id, grade_tables, grade_counters, internal_mapping)
+
+        yield file, student, issue
+
+
+def write_quarantine_list(quarantined):
+    """
+    Writes the ID, file and issue of each pdf that went over its budget
+    """
+    with open(settings.path_to_quarantine, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["ID No.", "File", "Issue"])
+        writer.writerows(quarantined)
+
+    msg = f"{len(quarantined)} pdfs quarantined, listed in {settings.path_to_quarantine}"
+    print(msg)
+    logging.warning(msg)
+
+
+def write_performance_report():
+    timings.write_report(
+        settings.path_to_performance_report, settings.path_to_performance_spans
+    )
+
+    report = timings.get_report()
+    if report["pages_per_second"] is not None:
+        msg = "{:.2f} pages per second, {:.2f} s per applicant".format(
+            report["pages_per_second"], report["seconds_per_applicant"] or 0
+        )
+        print(msg)
+        logging.info(msg)
+
+    print(f"Performance report written to {settings.path_to_performance_report}")
+
+
+def main(arguments):
+    # Imported here, so the script starts (e.g. with --help) without loading pandas and tabula
+    from tqdm import tqdm
+
+    from extraction import extract_all_students, get_extraction_pool, get_table_cache
+    from table_extractor import TableExtractor
+    from batch_snapshot import BatchSnapshot
+    from subject_names import SubjectNameTally
+    from extracted_students import ExtractedStudents
+    from file_distribution import FileDistributor
 
     start_time = get_current_time()
     print(f"Start Time: {start_time}")
+    timings.restart()
+
+    settings.create_directories()
+    initialise_logger()
+
+    # Mapping file is opened once, or the cached mappings are used if it hasn't changed
+    internal_mapping, math_mapping, phys_mapping, fm_mapping = load_mappings()
+
+    # Generates full path, size and modification time of the files to extract data from
+    # Extracts unique IDs from file name
+    all_files, applicant_ids = get_files_and_ids(settings.path_to_pdfs_to_extract)
 
     check_output_dirs_exist()
-    ALL_FILES, APPLICANT_IDS = order_pdfs_to_target_id_input(ALL_FILES, APPLICANT_IDS)
+
+    # Raw tables are kept so the workbook can be rebuilt with rebuild_workbook.py
+    # and an interrupted batch can be resumed
+    snapshot = BatchSnapshot(settings.path_to_snapshot)
+
+    if arguments.resume:
+        # A finished batch is already in the database => its IDs are taken from the
+        # snapshot, rather than checked against the database again
+        snapshot_ids, _ = snapshot.load_info()
+        all_files, applicant_ids = order_pdfs_to_snapshot_ids(
+            all_files, applicant_ids, snapshot_ids
+        )
+
+        # Same allocation to markers as before the batch was interrupted
+        finished_ids, marker_allocation = snapshot.resume(applicant_ids)
+        print(f"Resuming batch, {len(finished_ids)} students already extracted")
+        logging.info(f"Resuming batch, {len(finished_ids)} students already extracted")
+    else:
+        all_files, applicant_ids = order_pdfs_to_target_id_input(all_files, applicant_ids)
+        finished_ids, marker_allocation = set(), None
 
     # Initialise object to store extracted information
-    all_students = ExtractedStudents(APPLICANT_IDS, MATH_MAPPING, PHYS_MAPPING, FM_MAPPING)
-    counter = 0
+    all_students = ExtractedStudents(
+        applicant_ids, math_mapping, phys_mapping, fm_mapping, marker_allocation
+    )
+
+    if not arguments.resume:
+        snapshot.start(applicant_ids, all_students.marker_allocation)
+
+    remaining = [
+        (file, app_id)
+        for file, app_id in zip(all_files, applicant_ids)
+        if app_id not in finished_ids
+    ]
+    remaining_files = [file for file, _ in remaining]
+    remaining_ids = [app_id for _, app_id in remaining]
 
-    total_num_files = len(ALL_FILES)
+    # Path => PdfFile, for placing the pdf of each student
+    pdf_files = {pdf_file.path: pdf_file for pdf_file in all_files}
+
+    # Subject names are counted from the same tables as the workbook
+    tally = SubjectNameTally(internal_mapping) if settings.report_subject_names else None
+
+    total_num_files = len(all_files)
     print("Extracting tables for {} students".format(total_num_files))
 
+    # Worker processes are started before any thread, tqdm's included
+    workers = get_extraction_pool(arguments.workers)
+
     pbar = tqdm(total=total_num_files, desc="Table Processing: ")
-    # Iterate over all files and applicant IDs
-    for file, app_id in zip(ALL_FILES, APPLICANT_IDS):
-
-        # Start on 2nd page as 1st doesn't contain impt info
-        page_number = 2
-        exit_loop = False
-
-        # Initialise list to store the pandas dataframes from tabula
-        grade_tables = []
-        grade_counters = []
-
-        # Total number of pages not known before hand
-        while True:
-            try:
-                # Extract table from pdf
-                tables = tabula.read_pdf(
-                    file,
-                    pages=str(page_number),
-                    lattice=True,
-                    guess=True,
-                    pandas_options={"header": 0},
-                )
-            except subprocess.CalledProcessError:
-                logging.warning("EOF reached before exit condition")
-                logging.warning(f"Check file with ID: {app_id}")
-                all_students.add_student_sequentially(
-                    Student(app_id, grade_tables, grade_counters, INTERNAL_MAPPING), counter
-                )
-                copy_file(file, all_students, app_id)
-                # If EOF reached before exit table
-                # This shouldn't happen
-                break
-
-            # Iterate over all tables on the page
-            for table in tables:
-
-                # Get the table header
-                table_headers = table.columns
-                header_counter = Counter(list(table_headers.values))
-
-                # Determine if it is a targe table
-                if header_counter in TARGET_TABLES:
-                    # Fix table if it is across two pages
-                    table = fix_broken_table(page_number, table, file)
-
-                    # Add to list that stores the tables
-                    grade_tables.append(table)
-                    grade_counters.append(header_counter)
-
-                elif EXIT_STRING in table_headers:
-                    # Exit condition
-                    exit_loop = True
-
-            if exit_loop:
-                # Add completed form to all students
-                all_students.add_student_sequentially(
-                    Student(app_id, grade_tables, grade_counters, INTERNAL_MAPPING), counter
-                )
-                copy_file(file, all_students, app_id)
-                break
+    # A single tabula-java session is used for every pdf
+    # Each stage runs in its own thread, with a bounded queue between stages
+    # => extraction, building students, writing rows and placing files overlap
+    # and only a few students are held in memory at any time
+    quarantined = []
+
+    distributor = FileDistributor(
+        settings.pdf_distribution_mode,
+        settings.num_distribution_threads,
+        settings.pipeline_queue_size,
+    )
+    with TableExtractor() as extractor, workers as pool, distributor, snapshot:
+        # Tables are returned in the same order as the files, even with multiple workers
+        extracted = run_in_background(
+            extract_all_students(remaining_files, remaining_ids, extractor, pool),
+            settings.pipeline_queue_size,
+        )
+        extracted = add_finished_students(
+            extracted, all_files, applicant_ids, finished_ids, snapshot
+        )
+        students = run_in_background(
+            build_students(extracted, snapshot, tally, internal_mapping),
+            settings.pipeline_queue_size,
+        )
+
+        for counter, (file, student, issue) in enumerate(students):
 
-            # Go to next page in document
-            page_number += 1
+            # Over its budget => shown in the "Issues Importing?" column
+            if issue is not None:
+                all_students.add_import_issue(student.unique_id, issue)
+                quarantined.append((student.unique_id, file, issue))
 
-        # Go to next student
-        counter += 1
-        pbar.update()
+            # Write the rows of the student to the workbook
+            with span("write_rows", file):
+                all_students.add_student_sequentially(student, counter)
+            # Pdf is placed in the folder of its marker and in the pool
+            distributor.submit(
+                pdf_files[file], get_marker_file_path(file, all_students, student.unique_id)
+            )
+            distributor.submit(pdf_files[file], settings.path_to_pdf_pool)
+
+            # Go to next student
+            pbar.update()
 
     pbar.close()
 
-    # for student in all_students:
-    #     print("ID: {}".format(student.unique_id))
-    #     # print(student.uncompleted_qualifications)
-    #     # print("")
-    #     # print("{}".format(student.predicted_entries))
-    #     if student.completed_entries:
-    #         print("Completed Qualifications")
-    #         # print(student.completed_qualifications)
-    #         for entry in student.completed_entries:
-    #             print(entry)
-    #     print("")
-    #     if student.predicted_entries:
-    #         print("Predicted Grades")
-    #         # print(student.uncompleted_qualifications)
-    #         for entry in student.predicted_entries:
-    #             print(entry)
-    #     print("")
-    #     if student.results_entries:
-    #         print("Examination Results")
-    #         # print(student.exam_results)
-    #         for entry in student.results_entries:
-    #             print(entry)
-    #     print("")
-    #     print("")
-
-    all_students.write_to_excel(settings.output_path)
-    copy_pdfs_to_pool(ALL_FILES)
-    update_previous_id_database(
-        settings.path_to_database_of_extracted_pdfs, APPLICANT_IDS
-    )
+    table_cache = get_table_cache()
+    if table_cache is not None:
+        with span("table_cache_evict"):
+            table_cache.evict()
+
+    if quarantined:
+        write_quarantine_list(quarantined)
+
+    with span("write_to_excel"):
+        all_students.write_to_excel(settings.output_path)
+    with span("update_database"):
+        update_previous_id_database(
+            settings.path_to_database_of_extracted_pdfs, applicant_ids
+        )
+
+    if tally is not None:
+        tally.print_report()
+
+    if settings.record_timings:
+        write_performance_report()
 
     end_time = get_current_time()
     print(f"End Time: {end_time}")
+
+
+if __name__ == "__main__":
+    main(parse_arguments())
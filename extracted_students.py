@@ -16,48 +16,58 @@ from utils import (
 
 import settings
 from grade_entry import GradeEntry
+from mappings import SubjectCategories
+
+# Number of columns in the "Compiled" sheet
+MASTER_NUM_COLUMNS = 15
 
 
 class ExtractedStudents:
     """
-    Class that stores all the students and co-ordinates the output
+    Class that co-ordinates the output of all the students
+
+    The rows of each student are written to the workbook as it is added, so the students
+    (and their tables) don't need to be kept until the end of the batch
     """
 
-    def __init__(self, applicant_ids, math_mapping, physics_mapping, fm_mapping):
+    def __init__(
+        self, applicant_ids, math_mapping, physics_mapping, fm_mapping, marker_allocation=None
+    ):
         self.student_ids = applicant_ids
         self.math_mapping = math_mapping
         self. physics_mapping = physics_mapping
         self. fm_mapping = fm_mapping
 
-        self.num_students = len(applicant_ids)
+        # Compiled once, used to sort the entries of every student
+        self.subject_categories = SubjectCategories(math_mapping, physics_mapping, fm_mapping)
 
-        self.all_students = [None] * self.num_students
+        self.num_students = len(applicant_ids)
 
         #self.internal_mapping = internal_mapping
 
-        self.marker_allocation = self.assign_students_to_marker()
+        # An existing allocation is given when rebuilding the output of a batch
+        if marker_allocation is None:
+            self.marker_allocation = self.assign_students_to_marker()
+        else:
+            self.marker_allocation = marker_allocation
         # print(self.marker_allocation)
 
         self.student_to_marker_mapping = dict()
         self.map_student_to_marker()
         # print(self.student_to_marker_mapping)
 
-        self.index = -1
-
-    def __iter__(self):
-        return self
+        # Created when the first student is added
+        self.workbook = None
 
-    def __next__(self):
-        if self.index == self.num_students - 1:
-            raise StopIteration
+        # Applicant ID => issue importing its pdf, e.g. over the time allowed
+        self.import_issues = dict()
 
-        self.index += 1
-
-        return self.all_students[self.index]
+    def add_import_issue(self, app_id, issue):
+        self.import_issues[app_id] = issue
 
     def add_student_sequentially(self, new_student, counter):
         if new_student.unique_id == self.student_ids[counter]:
-            self.all_students[counter] = new_student
+            self.add_student_to_workbook(new_student)
         else:
             raise RuntimeError(
                 "The order of adding students is incorrect \n"
@@ -123,88 +133,63 @@ class ExtractedStudents:
         # return self.student_to_marker_mapping
 
     @staticmethod
-    def populate_normal_header(ws):
-        ws.cell(row=1, column=1, value="UCAS ID")
-        ws.cell(row=1, column=2, value="Qualification Type")
+    def populate_normal_header():
+        row = ["UCAS ID", "Qualification Type"]
 
-        for i in range(0, 8, 2):
-            ws.cell(row=1, column=3 + i, value="Subject")
-            ws.cell(row=1, column=4 + i, value="Grade")
+        for _ in range(0, 8, 2):
+            row += ["Subject", "Grade"]
 
-        return ws
+        return row
 
-    def populate_worksheet(self, desired_data, ws):
-        if desired_data not in self.all_students[0].which_grades.keys():
+    @staticmethod
+    def populate_worksheet(student, desired_data):
+        if desired_data not in student.which_grades.keys():
             raise InputError(False, "Key given not found in dictionary")
 
-        ws = self.populate_normal_header(ws)
-
-        lb = 2
-
-        for row_counter, student in zip(
-            range(lb, self.num_students + lb), self.all_students
-        ):
-
-            ws.cell(row=row_counter, column=1, value="{}".format(student.unique_id))
-
-            target_data = student.which_grades.get(desired_data)
-
-            if target_data is not None:
-                if len(target_data) > 0:
-                    ws.cell(
-                        row=row_counter,
-                        column=2,
-                        value="{}".format(target_data[0].qualification),
-                    )
-                else:
-                    ws.cell(
-                        row=row_counter,
-                        column=2,
-                        value="",
-                    )
+        row = ["{}".format(student.unique_id)]
 
-                col_counter = 3
+        target_data = student.which_grades.get(desired_data)
 
-                for entry in target_data:
-                    ws.cell(
-                        row=row_counter,
-                        column=col_counter,
-                        value="{}".format(entry.subject),
-                    )
-                    ws.cell(
-                        row=row_counter,
-                        column=col_counter + 1,
-                        value="{}".format(entry.grade),
-                    )
-                    col_counter += 2
+        if target_data is not None:
+            if len(target_data) > 0:
+                row.append("{}".format(target_data[0].qualification))
             else:
-                raise InputError(
-                    False,
-                    f"Key {desired_data} given not found in dictionary {student.which_grades}",
-                )
+                row.append("")
+
+            # Subject and grade of each entry, from the 3rd column
+            for entry in target_data:
+                row.append("{}".format(entry.subject))
+                row.append("{}".format(entry.grade))
+        else:
+            raise InputError(
+                False,
+                f"Key {desired_data} given not found in dictionary {student.which_grades}",
+            )
 
-        return ws
+        return tuple(row)
 
     @staticmethod
-    def populate_master_header(ws):
-
-        ws.cell(row=1, column=1, value="UCAS ID")
-        ws.cell(row=1, column=2, value="Qualification")
-        ws.cell(row=1, column=3, value="Issues Importing?")
-        ws.cell(row=1, column=4, value="No. Subjects")
-        ws.cell(row=1, column=5, value="Math Grade")
-        ws.cell(row=1, column=6, value="Physics Grade")
-        ws.cell(row=1, column=11, value="FM?")
-        ws.cell(row=1, column=12, value="Overall Grade")
-        ws.cell(row=1, column=13, value="Cycle")
-        ws.cell(row=1, column=14, value="Marker")
-        ws.cell(row=1, column=15, value="Batch")
+    def populate_master_header():
+        row = [None] * MASTER_NUM_COLUMNS
+
+        # Columns are counted from 1, as in excel
+        row[1 - 1] = "UCAS ID"
+        row[2 - 1] = "Qualification"
+        row[3 - 1] = "Issues Importing?"
+        row[4 - 1] = "No. Subjects"
+        row[5 - 1] = "Math Grade"
+        row[6 - 1] = "Physics Grade"
+        row[11 - 1] = "FM?"
+        row[12 - 1] = "Overall Grade"
+        row[13 - 1] = "Cycle"
+        row[14 - 1] = "Marker"
+        row[15 - 1] = "Batch"
 
         for i in range(0, 4, 2):
-            ws.cell(row=1, column=7 + i, value="Grade")
-            ws.cell(row=1, column=8 + i, value="Subject")
+            row[7 + i - 1] = "Grade"
+            row[8 + i - 1] = "Subject"
 
-        return ws
+        return row
 
     @staticmethod
     def update_al_string(categorised_entries, input_string, is_fm):
@@ -223,147 +208,117 @@ class ExtractedStudents:
                 # If the list is empty => 3 subjects
                 return input_string + " (A*A*A)"
 
-    def compile_for_master(self, ws):
+    def compile_for_master(self, student):
+        # Columns are counted from 1, as in excel
+        row = [None] * MASTER_NUM_COLUMNS
+
+        # Fill in UCAS ID
+        row[1 - 1] = "{}".format(student.unique_id)
+
+        # Fill with admin details
+        row[13 - 1] = settings.cycle
+        # What are the brackets in self.student_to_marker_mapping
+        # [student.unique_id] => get value using that key
+        # [0] => first value in list (value of key is a list)
+        # [:2] => slice first two letters in string (initials of maker)
+        row[14 - 1] = self.student_to_marker_mapping[student.unique_id][0][:2]
+        row[15 - 1] = settings.batch_number
+
+        # Categorise each entry into subjects
+        categorised_entries = self.sort_into_subjects(student, self.subject_categories)
+
+        # Identify if FM is presetn
+        if categorised_entries["fm"]:
+            is_fm = True
+            row[11 - 1] = "Yes"
+        else:
+            is_fm = False
+            row[11 - 1] = "No"
 
-        ws = self.populate_master_header(ws)
+        # Identify and populate cell with the main qualification
+        main_qualification = student.get_main_qualification()
 
-        lb = 2
+        if main_qualification == "" or main_qualification is None:
+            row[2 - 1] = ""
+            row[3 - 1] = "Need manual entry: no valid qual found"
+            return tuple(row)
 
-        for row_counter, student in zip(
-            range(lb, self.num_students + lb), self.all_students
-        ):
-            # Fill in UCAS ID
-            ws.cell(row=row_counter, column=1, value="{}".format(student.unique_id))
+        if "United Kingdom" in main_qualification:
+            uk_based = True
+        else:
+            uk_based = False
 
-            # Fill with admin details
-            ws.cell(row=row_counter, column=13, value=settings.cycle)
-            # What are the brackets in self.student_to_marker_mapping
-            # [student.unique_id] => get value using that key
-            # [0] => first value in list (value of key is a list)
-            # [:2] => slice first two letters in string (initials of maker)
-            ws.cell(
-                row=row_counter,
-                column=14,
-                value=self.student_to_marker_mapping[student.unique_id][0][:2],
+        if "A Levels" in main_qualification:
+            main_qualification = self.update_al_string(
+                categorised_entries, main_qualification, is_fm
             )
-            ws.cell(row=row_counter, column=15, value=settings.batch_number)
-
-            # Categorise each entry into subjects
-            categorised_entries = self.sort_into_subjects(student, self.math_mapping, self.physics_mapping, self.fm_mapping)
-
-            # Identify if FM is presetn
-            if categorised_entries["fm"]:
-                is_fm = True
-                ws.cell(row=row_counter, column=11, value="Yes")
-            else:
-                is_fm = False
-                ws.cell(row=row_counter, column=11, value="No")
-
-            # Identify and populate cell with the main qualification
-            main_qualification = student.get_main_qualification()
-
-            if main_qualification == "" or main_qualification is None:
-                ws.cell(row=row_counter, column=2, value="")
-                ws.cell(
-                    row=row_counter,
-                    column=3,
-                    value="Need manual entry: no valid qual found",
-                )
-                continue
 
-            if "United Kingdom" in main_qualification:
-                uk_based = True
-            else:
-                uk_based = False
+        # Fill in the qualification to the worksheet
+        row[2 - 1] = "{}".format(main_qualification.strip())
 
-            if "A Levels" in main_qualification:
-                main_qualification = self.update_al_string(
-                    categorised_entries, main_qualification, is_fm
-                )
+        # Create log for issues
+        any_issues = self.log_issues(categorised_entries, uk_based, row)
 
-            # Fill in the qualification to the worksheet
-            ws.cell(
-                row=row_counter, column=2, value="{}".format(main_qualification.strip())
-            )
+        # Get all unique qualifications
+        qualification = student.unique_qualifications()
 
-            # Create log for issues
-            any_issues = self.log_issues(categorised_entries, uk_based, ws, row_counter)
+        # Identify if the qualification has an overall score
+        # Intersection of qualification set and set of qualifications with overall score is not empty
+        intersection_qualification = (
+            qualification & qualifications_with_overall_score()
+        )
+        # If it does, find the overall score
+        if intersection_qualification:
 
-            # Get all unique qualifications
-            qualification = student.unique_qualifications()
-
-            # Identify if the qualification has an overall score
-            # Intersection of qualification set and set of qualifications with overall score is not empty
-            intersection_qualification = (
-                qualification & qualifications_with_overall_score()
+            overall_grade = self.determine_overall_grade(
+                intersection_qualification, student
             )
-            # If it does, find the overall score
-            if intersection_qualification:
 
-                overall_grade = self.determine_overall_grade(
-                    intersection_qualification, student
-                )
+            # If an overall grade exists, populate cell
+            num_overall_grade = len(overall_grade)
 
-                # If an overall grade exists, populate cell
-                num_overall_grade = len(overall_grade)
-
-                # If an overall grade exists
-                if num_overall_grade > 1:
-                    # Log multiple grades as an issue
-                    if any_issues is not None:
-                        any_issues.append("Multiple overall score. 1st selected.")
-                    else:
-                        # If any_issue is None => M&P grade not found. Skip rest of loop
-                        ws.cell(
-                            row=row_counter,
-                            column=3,
-                            value="M&P missing, need manual entry. Multiple overall score. 1st selected.",
-                        )
-                        output_overall_grade = self.strip_overall_grade_spaces(
-                            overall_grade
-                        )
-                        ws.cell(
-                            row=row_counter,
-                            column=12,
-                            value="{}".format(output_overall_grade),
-                        )
-                        continue
-
-                # Populate if list is not empty
-                if num_overall_grade != 0:
+            # If an overall grade exists
+            if num_overall_grade > 1:
+                # Log multiple grades as an issue
+                if any_issues is not None:
+                    any_issues.append("Multiple overall score. 1st selected.")
+                else:
+                    # If any_issue is None => M&P grade not found. Skip rest of row
+                    row[3 - 1] = "M&P missing, need manual entry. Multiple overall score. 1st selected."
                     output_overall_grade = self.strip_overall_grade_spaces(
                         overall_grade
                     )
-                    ws.cell(
-                        row=row_counter,
-                        column=12,
-                        value="{}".format(output_overall_grade),
-                    )
+                    row[12 - 1] = "{}".format(output_overall_grade)
+                    return tuple(row)
 
-            # If M&P missing, clearly there is an issue. Skip the rest of loop
-            if any_issues is None:
-                ws.cell(
-                    row=row_counter, column=3, value="M&P missing, need manual entry"
+            # Populate if list is not empty
+            if num_overall_grade != 0:
+                output_overall_grade = self.strip_overall_grade_spaces(
+                    overall_grade
                 )
-                continue
-
-            self.populate_grades(
-                categorised_entries,
-                ws,
-                is_fm,
-                row_counter,
-                any_issues,
-            )
-
-            # Compress list of strings into a single string
-            any_issues = self.compress_log(any_issues)
-            # Populate cell with string
-            if any_issues is None:
-                ws.cell(row=row_counter, column=3, value="")
-            else:
-                ws.cell(row=row_counter, column=3, value=any_issues)
+                row[12 - 1] = "{}".format(output_overall_grade)
+
+        # If M&P missing, clearly there is an issue. Skip the rest of row
+        if any_issues is None:
+            row[3 - 1] = "M&P missing, need manual entry"
+            return tuple(row)
+
+        self.populate_grades(
+            categorised_entries,
+            row,
+            is_fm,
+            any_issues,
+        )
+
+        # Compress list of strings into a single string
+        any_issues = self.compress_log(any_issues)
+        # Populate cell with string
+        if any_issues is None:
+            row[3 - 1] = ""
+        else:
+            row[3 - 1] = any_issues
 
-        return ws
+        return tuple(row)
 
     @staticmethod
     def strip_overall_grade_spaces(overall_grades):
@@ -402,9 +357,8 @@ class ExtractedStudents:
     def populate_grades(
         self,
         categorised_entries,
-        ws,
+        row,
         is_fm,
-        row_counter,
         any_issues,
     ):
         # Populate subject and grades
@@ -426,7 +380,7 @@ class ExtractedStudents:
             if len(subject_entries) == 1:
                 for col, val in zip(excel_col, subject_entries[0].grade_info):
                     val = self.sanitise_grade_of_pass(val)
-                    ws.cell(row=row_counter, column=col, value=val)
+                    row[col - 1] = val
 
             # if it is at the 3rd subject, and not FM then iterate over all
             elif subject_counter == 2 and not is_fm:
@@ -434,14 +388,14 @@ class ExtractedStudents:
                     excel_col = map_subject_num_to_cols.get(subject_counter)
                     for col, val in zip(excel_col, entry.grade_info):
                         val = self.sanitise_grade_of_pass(val)
-                        ws.cell(row=row_counter, column=col, value=val)
+                        row[col - 1] = val
                     subject_counter += 1
 
             # If there is FM and there are more than 4 subjects, populate with 1st
             elif subject_counter == 3 and len(subject_entries) > 1:
                 for col, val in zip(excel_col, subject_entries[0].grade_info):
                     val = self.sanitise_grade_of_pass(val)
-                    ws.cell(row=row_counter, column=col, value=val)
+                    row[col - 1] = val
 
             # Doesn't fall into any of above cases => special case
             else:
@@ -478,21 +432,21 @@ class ExtractedStudents:
 
                 for col, val in zip(excel_col, selected.grade_info):
                     val = self.sanitise_grade_of_pass(val)
-                    ws.cell(row=row_counter, column=col, value=val)
+                    row[col - 1] = val
 
             subject_counter += 1
 
-        overall_grade = ws.cell(row=row_counter, column=12).value
+        overall_grade = row[12 - 1]
         if overall_grade is None:
-            self.populate_alphabetic_overall_grade(ws, row_counter)
+            self.populate_alphabetic_overall_grade(row)
 
     @staticmethod
-    def populate_alphabetic_overall_grade(ws, row_counter):
+    def populate_alphabetic_overall_grade(row):
         overall_grade = ""
         target_cols = [5, 6, 7, 9]
 
         for col in target_cols:
-            grade_val = ws.cell(row=row_counter, column=col).value
+            grade_val = row[col - 1]
             if grade_val is None:
                 if col != 9:
                     # If final one is empty, don't append anything
@@ -507,7 +461,7 @@ class ExtractedStudents:
                 else:
                     overall_grade += grade_val
 
-        ws.cell(row=row_counter, column=12, value="{}".format(overall_grade))
+        row[12 - 1] = "{}".format(overall_grade)
 
     @staticmethod
     def determine_overall_grade(intersection_qualification, student):
@@ -595,7 +549,7 @@ class ExtractedStudents:
             return None
 
     @staticmethod
-    def log_issues(categorised_entries, uk_based, ws, rowCounter):
+    def log_issues(categorised_entries, uk_based, row):
         convert_lst_to_bool = [
             not bool(cat_entry) for cat_entry in categorised_entries.values()
         ]
@@ -615,10 +569,10 @@ class ExtractedStudents:
             elif entries_length > 2 and subject == "additional_subjects":
                 if not uk_based:
                     # log.append("Multiple Subjects.")
-                    ws.cell(row=rowCounter, column=4, value="Multiple")
+                    row[4 - 1] = "Multiple"
                 else:
                     # log.append(">4 Subjects.")
-                    ws.cell(row=rowCounter, column=4, value=">4")
+                    row[4 - 1] = ">4"
             elif (
                 entries_length == 0
                 and subject != "fm"
@@ -629,7 +583,7 @@ class ExtractedStudents:
         return log
 
     @staticmethod
-    def sort_into_subjects(student, math_mapping, physics_mapping, fm_mapping):
+    def sort_into_subjects(student, subject_categories):
 
         categorised_entries = {
             "math": [],
@@ -643,36 +597,69 @@ class ExtractedStudents:
             # List of entries are not empty
             if grade_entries:
                 for entry in grade_entries:
-                    if escape_backslash_r(entry.subject).lower() in {s.lower() for s in math_mapping.get(entry.qualification, set())}:
-                        categorised_entries["math"].append(entry)
-                    elif escape_backslash_r(entry.subject).lower() in {s.lower() for s in physics_mapping.get(entry.qualification, set())}:
-                        categorised_entries["physics"].append(entry)
-                    elif escape_backslash_r(entry.subject).lower() in {s.lower() for s in fm_mapping.get(entry.qualification, set())}:
-                        categorised_entries["fm"].append(entry)
-                    else:
-                        categorised_entries["additional_subjects"].append(entry)
+                    category = subject_categories.get_category(
+                        entry.qualification, escape_backslash_r(entry.subject)
+                    )
+                    categorised_entries[category].append(entry)
 
         return categorised_entries
 
-    def write_to_excel(self, output_abs_path):
-
-        is_abs_path(output_abs_path)
+    def create_workbook(self):
 
         from openpyxl import Workbook
 
-        wb = Workbook()
+        # Write-only => each row is written to a temporary file as it is appended,
+        # instead of keeping every cell of the batch in memory until it is saved
+        wb = Workbook(write_only=True)
 
-        # Create and populate workshets
+        # Same sheets, in the same order, as a normal workbook
+        wb.create_sheet("Sheet")
+
+        # Create workshets and populate headers
         completed = wb.create_sheet("Completed Qualifications")
-        completed = self.populate_worksheet("completed", completed)
+        completed.append(self.populate_normal_header())
 
         predicted = wb.create_sheet("Predicted Grades")
-        predicted = self.populate_worksheet("predicted", predicted)
+        predicted.append(self.populate_normal_header())
 
         exam_results = wb.create_sheet("Exam Results")
-        exam_results = self.populate_worksheet("results", exam_results)
+        exam_results.append(self.populate_normal_header())
 
         compiled_single = wb.create_sheet("Compiled", 0)
-        compiled_single = self.compile_for_master(compiled_single)
+        compiled_single.append(self.populate_master_header())
+
+        return wb
+
+    def get_workbook(self):
+        if self.workbook is None:
+            self.workbook = self.create_workbook()
+
+        return self.workbook
+
+    def add_student_to_workbook(self, student):
+        self.get_workbook()
+
+        # Rows must be appended in order, as they can't be revisited in a write-only workbook
+        self.workbook["Completed Qualifications"].append(
+            self.populate_worksheet(student, "completed")
+        )
+        self.workbook["Predicted Grades"].append(
+            self.populate_worksheet(student, "predicted")
+        )
+        self.workbook["Exam Results"].append(self.populate_worksheet(student, "results"))
+
+        row = self.compile_for_master(student)
+        issue = self.import_issues.pop(student.unique_id, None)
+        if issue is not None:
+            # Placed before any issue with the grades
+            issues = " ".join(filter(None, (issue, row[3 - 1])))
+            row = row[: 3 - 1] + (issues,) + row[3:]
+
+        self.workbook["Compiled"].append(row)
+
+    def write_to_excel(self, output_abs_path):
+
+        is_abs_path(output_abs_path)
 
-        wb.save(os.path.join(output_abs_path, settings.output_filename))
+        # A write-only workbook can only be saved once
+        self.get_workbook().save(os.path.join(output_abs_path, settings.output_filename))
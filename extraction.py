@@ -0,0 +1,495 @@
+"""
+    Extracts the target tables from the UCAS pdfs
+"""
+
+import time
+import queue
+import logging
+import multiprocessing
+
+from collections import Counter, deque, namedtuple
+from contextlib import nullcontext
+from itertools import count
+
+import settings
+from table_cache import TableCache
+from table_extractor import TABULA_OPTIONS, PdfBudget, PdfBudgetExceeded, TableExtractor
+from timing import span, timings
+from utils import fix_broken_table
+from pdf_strings import (
+    desired_tables,
+    get_exit_string,
+    raw_table_headers,
+)
+
+# From the PDFs, these are the headers of the tables we want
+# They have been placed in a counter for easy comparison
+TARGET_TABLES = desired_tables()
+# First table after the desired ones that always occur
+EXIT_STRING = get_exit_string()
+
+# As above, but as they appear in the text layer of a pdf, without any whitespace
+TARGET_HEADER_TEXT = [
+    ["".join(header.split()) for header in headers] for headers in raw_table_headers()
+]
+EXIT_TEXT = "".join(EXIT_STRING.split())
+
+# Start on 2nd page as 1st doesn't contain impt info
+FIRST_PAGE = 2
+
+# Extractor used by a worker process, started by init_worker
+worker_extractor = None
+# Queue a worker process reports the pdfs it starts on to, set by init_worker
+worker_start_queue = None
+
+
+class WorkerLogHandler(logging.Handler):
+    """
+    Class that keeps the log records of a worker process, so they are written to the log
+    by the main process. Workers that aren't forked don't have the handler of the log file.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        # Message is formatted here, as its arguments may not be picklable
+        record.msg = record.getMessage()
+        record.args = None
+        record.exc_info = None
+        self.records.append(record)
+
+    def drain(self):
+        records = self.records
+        self.records = []
+        return records
+
+
+worker_log = WorkerLogHandler()
+
+
+def locate_table_pages(file, first_page):
+    """
+    Uses the text layer of a pdf to find the pages with a target table or the exit table
+
+    Pages before first_page and after the exit table are left out.
+    Returns None if the pages can't be located, in which case every page should be read
+    """
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        logging.warning("pypdf not installed. Pages can't be located from text")
+        return None
+
+    page_numbers = []
+
+    try:
+        reader = PdfReader(file)
+
+        for page_number in range(first_page, len(reader.pages) + 1):
+            text = "".join(reader.pages[page_number - 1].extract_text().split())
+
+            if EXIT_TEXT in text:
+                page_numbers.append(page_number)
+                return page_numbers
+
+            if any(all(header in text for header in headers) for headers in TARGET_HEADER_TEXT):
+                page_numbers.append(page_number)
+
+    except Exception as error:
+        # Any failure here only means every page is read instead
+        logging.warning(f"Text of {file} could not be read: {error}")
+        return None
+
+    # No exit table => text layer is missing or incomplete, so it can't be relied on
+    logging.info(f"Exit table not found in text of {file}. Reading every page")
+    return None
+
+
+def extract_grade_tables(file, extractor):
+    """
+    Iterates over the pages of a pdf and collects the target tables
+
+    Returns the tables, their header counters and whether the exit table was found
+    """
+
+    page_numbers = None
+    if settings.locate_pages_from_text:
+        # Only pages with tables of interest (and the page after, if a table is broken)
+        # are then parsed by tabula
+        with span("locate_pages", file):
+            page_numbers = locate_table_pages(file, FIRST_PAGE)
+
+    if page_numbers is None:
+        # Total number of pages not known before hand
+        page_numbers = count(FIRST_PAGE)
+
+    # Initialise list to store the pandas dataframes from tabula
+    grade_tables = []
+    grade_counters = []
+
+    for page_number in page_numbers:
+        # Only the pages searched count towards the budget, not those after the exit table
+        if extractor.budget is not None:
+            extractor.budget.count_page()
+
+        # Extract table from pdf
+        tables = extractor.read_page(file, page_number)
+
+        if tables is None:
+            # If EOF reached before exit table
+            # This shouldn't happen
+            return grade_tables, grade_counters, False
+
+        exit_loop = False
+
+        # Iterate over all tables on the page
+        for table in tables:
+
+            # Get the table header
+            table_headers = table.columns
+            header_counter = Counter(list(table_headers.values))
+
+            # Determine if it is a targe table
+            if header_counter in TARGET_TABLES:
+                # Fix table if it is across two pages
+                # The next page is read from the cache of the extractor
+                with span("fix_broken_table", file, page_number):
+                    table = fix_broken_table(page_number, table, file, extractor)
+
+                # Add to list that stores the tables
+                grade_tables.append(table)
+                grade_counters.append(header_counter)
+
+            elif EXIT_STRING in table_headers:
+                # Exit condition
+                exit_loop = True
+
+        if exit_loop:
+            return grade_tables, grade_counters, True
+
+    return grade_tables, grade_counters, False
+
+
+def get_table_cache():
+    if not settings.use_table_cache:
+        return None
+
+    return TableCache(settings.path_to_table_cache, settings.table_cache_max_bytes)
+
+
+def get_extraction_parameters():
+    """
+    Parameters that change the tables extracted from a pdf, used to key the table cache
+    """
+    return {
+        "tabula": TABULA_OPTIONS,
+        "first_page": FIRST_PAGE,
+        "pages": "located" if settings.locate_pages_from_text else "all",
+    }
+
+
+def init_worker(start_queue):
+    """
+    Gives each worker process its own extractor, so the JVM is started once per worker
+    """
+    global worker_extractor, worker_start_queue
+    worker_extractor = TableExtractor()
+    worker_start_queue = start_queue
+
+    # A forked worker starts with the spans of the main process, which aren't its own
+    timings.restart()
+
+    # Records are sent back with each result, and logged by the main process
+    root_logger = logging.getLogger()
+    root_logger.handlers = [worker_log]
+    root_logger.setLevel(logging.INFO)
+
+
+def get_quarantine_issue(limit):
+    """
+    Issue shown in the workbook for a pdf over the limit, "time" or "pages"
+    """
+    if limit == "time":
+        return f"Quarantined: pdf over {settings.max_seconds_per_pdf} s."
+
+    return f"Quarantined: pdf over {settings.max_pages_per_pdf} pages."
+
+
+def quarantine(file, app_id, limit, message):
+    """
+    Result for a pdf over its budget: no tables, and the issue to show in the workbook
+    """
+    logging.warning(f"Quarantined ID: {app_id}, {limit} limit hit. {message}")
+
+    return file, app_id, [], [], False, get_quarantine_issue(limit)
+
+
+def extract_student_tables(file_and_id, extractor=None):
+    """
+    Unit of work for a single pdf. Kept at module level so it can be sent to a worker
+
+    file_and_id holds the PdfFile and ID of the pdf. Returns the path to the file, ID,
+    tables, header counters, whether the exit table was found, and the issue importing the
+    pdf (None unless it went over its budget)
+    """
+    if extractor is None:
+        extractor = worker_extractor
+
+    pdf_file, app_id = file_and_id
+    file = pdf_file.path
+
+    # Skip tabula if the same pdf has been extracted before
+    table_cache = get_table_cache()
+    if table_cache is not None:
+        with span("table_cache_load", file):
+            cache_key = table_cache.make_key(pdf_file, get_extraction_parameters())
+            extracted = table_cache.load(cache_key)
+        if extracted is not None:
+            grade_tables, grade_counters, found_exit = extracted
+            return file, app_id, grade_tables, grade_counters, found_exit, None
+
+    extractor.budget = PdfBudget(
+        file, settings.max_seconds_per_pdf, settings.max_pages_per_pdf
+    )
+    try:
+        with span("extract_pdf", file):
+            grade_tables, grade_counters, found_exit = extract_grade_tables(file, extractor)
+    except PdfBudgetExceeded as error:
+        # Not cached => the pdf is tried again if the batch is rerun
+        return quarantine(file, app_id, error.limit, error.message)
+    finally:
+        extractor.budget = None
+
+    if table_cache is not None:
+        table_cache.store(cache_key, grade_tables, grade_counters, found_exit)
+
+    return file, app_id, grade_tables, grade_counters, found_exit, None
+
+
+def get_pool_timeout():
+    """
+    Longest wait for the result of a worker, in case a single call to tabula never returns
+    Budgets are only checked between pages => the page being read is given as long again
+    """
+    if settings.max_seconds_per_pdf is None:
+        return None
+
+    return 2 * settings.max_seconds_per_pdf
+
+
+def extract_in_worker(extract, task_id, file_and_id):
+    """
+    Runs extract on a pdf in a worker process, after reporting when it started on it
+    Also returns the timing spans and log records of the worker
+    """
+    worker_start_queue.put((task_id, time.time()))
+
+    return extract(file_and_id), timings.drain(), worker_log.drain()
+
+
+def get_pool_context():
+    """
+    Workers are started by a fork server where there is one, and spawned otherwise (e.g.
+    on Windows). A pool replaced while the other stages of a run have threads then isn't
+    forked from a process with threads.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+
+    return multiprocessing.get_context("spawn")
+
+
+class QuarantinedResult:
+    """
+    Class that stands in for the result of a pdf quarantined by the pool
+    """
+
+    def __init__(self, extracted):
+        self.extracted = extracted
+
+    def ready(self):
+        return True
+
+    def wait(self, timeout=None):
+        pass
+
+    def get(self):
+        return self.extracted, [], []
+
+
+# file_and_id => PdfFile and ID of the pdf
+# task_id     => number the worker reports when it starts on the pdf
+# result      => AsyncResult of the pdf, or a QuarantinedResult
+PoolTask = namedtuple("PoolTask", ["file_and_id", "task_id", "result"])
+
+
+class ExtractionPool:
+    """
+    Class that extracts pdfs over a pool of worker processes, each with its own extractor
+
+    Each worker reports when it starts on a pdf, so a pdf is timed from then, not from
+    when its result is waited for. If a pdf takes longer than the timeout, e.g. a call to
+    tabula that never returns, it is quarantined. The stuck worker can't be stopped on its
+    own, so the pool is replaced. Results that are already finished are kept, and only the
+    unfinished pdfs are sent again.
+
+    Create the pool before any threads are started, as its workers are started with it.
+    Use as a context manager so the workers are stopped,
+        with ExtractionPool(4) as pool:
+            for extracted in pool.extract_all(zip(all_files, applicant_ids)):
+                ...
+    """
+
+    def __init__(self, num_workers, extract=extract_student_tables):
+        self.num_workers = num_workers
+        # Unit of work for a single pdf, sent to the workers
+        self.extract = extract
+        self.timeout = get_pool_timeout()
+
+        self.context = get_pool_context()
+        self.task_ids = count()
+        # Task ID => time its worker started on it
+        self.start_times = dict()
+
+        self.pool = None
+        self.start_queue = None
+        self.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def start(self):
+        # A worker stopped while writing to a queue can leave it broken => one per pool
+        self.start_queue = self.context.Queue()
+        self.pool = self.context.Pool(
+            processes=self.num_workers,
+            initializer=init_worker,
+            initargs=(self.start_queue,),
+        )
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool = None
+
+    def submit(self, file_and_id):
+        task_id = next(self.task_ids)
+        result = self.pool.apply_async(extract_in_worker, (self.extract, task_id, file_and_id))
+
+        return PoolTask(file_and_id, task_id, result)
+
+    def read_start_times(self):
+        while True:
+            try:
+                task_id, start_time = self.start_queue.get_nowait()
+            except queue.Empty:
+                return
+
+            self.start_times[task_id] = start_time
+
+    def replace_stuck_workers(self, pending):
+        """
+        Quarantines the pdfs that have been read for longer than the timeout
+        If there are any, the pool is replaced and the unfinished pdfs are sent again
+        """
+        self.read_start_times()
+
+        now = time.time()
+        is_stuck = [
+            not task.result.ready()
+            and now - self.start_times.get(task.task_id, now) > self.timeout
+            for task in pending
+        ]
+        if not any(is_stuck):
+            return
+
+        self.pool.terminate()
+        self.start()
+
+        for index, (task, stuck) in enumerate(zip(pending, is_stuck)):
+            if stuck:
+                pdf_file, app_id = task.file_and_id
+                message = f"{pdf_file.path} gave no result after {self.timeout} s"
+                result = QuarantinedResult(
+                    quarantine(pdf_file.path, app_id, "time", message)
+                )
+                pending[index] = task._replace(result=result)
+            elif not task.result.ready():
+                pending[index] = self.submit(task.file_and_id)
+
+        self.start_times.clear()
+
+    def get_result(self, pending):
+        """
+        Returns the result of the oldest pdf sent to the pool
+        """
+        if self.timeout is not None:
+            # Checked a few times within the timeout
+            wait_seconds = min(1, self.timeout / 10)
+
+            while not pending[0].result.ready():
+                pending[0].result.wait(wait_seconds)
+                self.replace_stuck_workers(pending)
+
+        task = pending.popleft()
+        self.start_times.pop(task.task_id, None)
+
+        extracted, spans, records = task.result.get()
+        timings.extend(spans)
+        for record in records:
+            logging.getLogger(record.name).handle(record)
+
+        return extracted
+
+    def extract_all(self, files_and_ids):
+        """
+        Generator over the extracted tables of every pdf, in the same order as the input
+        """
+        # Only a few pdfs are sent to the pool ahead of the one being yielded
+        # pool.imap would send them all => results pile up if the caller is slower
+        pending = deque()
+        for file_and_id in files_and_ids:
+            pending.append(self.submit(file_and_id))
+
+            if len(pending) > 2 * self.num_workers:
+                yield self.get_result(pending)
+
+        while pending:
+            yield self.get_result(pending)
+
+
+def get_extraction_pool(num_workers):
+    """
+    Returns the pool to extract the pdfs over, as a context manager
+
+    A call to tabula that never returns can only be stopped in another process, so a
+    single worker is also run in a pool if there is a time limit. Otherwise, None is
+    entered and the pdfs are extracted in this process.
+    """
+    if num_workers > 1 or get_pool_timeout() is not None:
+        return ExtractionPool(num_workers)
+
+    return nullcontext()
+
+
+def extract_all_students(all_files, applicant_ids, extractor, pool=None):
+    """
+    Generator over the extracted tables of every pdf, all_files holding their PdfFiles
+
+    The pdfs are spread over the worker processes of pool, if given. Otherwise, the
+    extractor given is used.
+    Results are always yielded in the same order as the input files.
+    """
+    files_and_ids = zip(all_files, applicant_ids)
+
+    if pool is not None:
+        yield from pool.extract_all(files_and_ids)
+    else:
+        for file_and_id in files_and_ids:
+            yield extract_student_tables(file_and_id, extractor)
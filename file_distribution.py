@@ -0,0 +1,230 @@
+"""
+    Contains the helpers used to place the pdfs in the marker folders and the pool
+"""
+
+import os
+import errno
+import shutil
+import logging
+import threading
+
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from timing import span
+
+try:
+    import fcntl
+except ImportError:
+    # Windows has no fcntl => files are never cloned there
+    fcntl = None
+
+# ioctl that makes a file share the data of another (a reflink), on Btrfs, XFS, etc.
+FICLONE = 0x40049409
+
+DISTRIBUTION_MODES = ("hardlink", "clone", "copy")
+
+# Errors that mean a method isn't supported between two folders, e.g. on another filesystem
+# Any other error (e.g. a full disk, no permission) is raised, as it would be by a copy
+UNSUPPORTED_ERRNOS = {errno.EXDEV, errno.EOPNOTSUPP, errno.EINVAL, errno.ENOSYS, errno.ENOTTY}
+if hasattr(errno, "ENOTSUP"):
+    UNSUPPORTED_ERRNOS.add(errno.ENOTSUP)
+# Some filesystems (e.g. FAT, some network shares) refuse hardlinks with EPERM
+UNSUPPORTED_LINK_ERRNOS = UNSUPPORTED_ERRNOS | {errno.EPERM}
+
+
+def hardlink_file(source, destination):
+    os.link(source, destination)
+
+
+def clone_file(source, destination):
+    with open(source, "rb") as source_file, open(destination, "wb") as destination_file:
+        fcntl.ioctl(destination_file.fileno(), FICLONE, source_file.fileno())
+
+
+def copy_file_range(source, destination):
+    """
+    Copies the file inside the kernel, which may be done by the filesystem or server
+    without the data passing through this process
+    """
+    with open(source, "rb") as source_file, open(destination, "wb") as destination_file:
+        remaining = os.fstat(source_file.fileno()).st_size
+        while remaining > 0:
+            num_copied = os.copy_file_range(
+                source_file.fileno(), destination_file.fileno(), remaining
+            )
+            if num_copied == 0:
+                break
+            remaining -= num_copied
+
+
+def copy_file(source, destination):
+    shutil.copyfile(source, destination)
+
+
+# Methods tried for each mode, in order. Copying always works so is the last method
+METHODS = {
+    "hardlink": (hardlink_file, clone_file, copy_file_range, copy_file),
+    "clone": (clone_file, copy_file_range, copy_file),
+    "copy": (copy_file,),
+}
+
+
+def is_unsupported(method, error):
+    if method is hardlink_file:
+        return error.errno in UNSUPPORTED_LINK_ERRNOS
+
+    return error.errno in UNSUPPORTED_ERRNOS
+
+
+def is_placed(pdf_file, destination):
+    try:
+        stat = os.stat(destination)
+    except FileNotFoundError:
+        return False
+
+    return stat.st_size == pdf_file.size and stat.st_mtime == pdf_file.mtime
+
+
+def get_methods(mode):
+    if mode not in METHODS:
+        raise ValueError(f"Distribution mode must be one of {DISTRIBUTION_MODES}, not {mode}")
+
+    # Cloning needs fcntl (not on Windows) and copy_file_range is only available on Linux
+    is_available = {
+        clone_file: fcntl is not None,
+        copy_file_range: hasattr(os, "copy_file_range"),
+    }
+
+    return tuple(method for method in METHODS[mode] if is_available.get(method, True))
+
+
+class FileDistributor:
+    """
+    Class that places files in other folders on a pool of background threads
+
+    Depending on the mode, a file is hardlinked, cloned (reflink), or copied inside the
+    kernel with copy_file_range, so its data isn't written again. If the filesystem doesn't
+    support a method, the next one is tried, down to a normal copy. A method that isn't
+    supported between two devices is not tried again for them. Any other error, e.g. a
+    full disk, is raised.
+    Hardlinked files share their data, so annotating a file in a marker folder also
+    changes the original pdf. Cloned files don't.
+
+    A file already at its destination, with the same size and modification time as the
+    pdf, is not placed again, e.g. when a batch is resumed. Placed files keep the
+    modification time of the pdf for this.
+
+    At most maxsize files are waiting at any time. The first exception raised is raised
+    again by submit or close.
+
+    Use as a context manager so every file is placed before moving on,
+        with FileDistributor("clone", 4, 8) as distributor:
+            distributor.submit(pdf_file, destination)
+    """
+
+    def __init__(self, mode, num_threads, maxsize):
+        self.methods = get_methods(mode)
+
+        self.executor = ThreadPoolExecutor(
+            max_workers=num_threads, thread_name_prefix="distribution"
+        )
+        self.slots = threading.BoundedSemaphore(maxsize)
+        self.lock = threading.Lock()
+        self.error = None
+
+        # (source device, destination device) => methods that failed between them
+        self.failed_methods = dict()
+        # Number of files placed with each method
+        self.num_placed = Counter()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            # Already failing => finish the waiting files without hiding the exception
+            self.executor.shutdown(wait=True)
+        return False
+
+    def raise_error(self):
+        if self.error is not None:
+            raise self.error
+
+    def submit(self, pdf_file, destination):
+        """
+        Places the file of a PdfFile at destination, a path to a file or a folder
+        """
+        self.raise_error()
+        self.slots.acquire()
+
+        future = self.executor.submit(self.place_and_time, pdf_file, destination)
+        future.add_done_callback(self.finish)
+
+    def finish(self, future):
+        error = future.exception()
+        if error is not None:
+            with self.lock:
+                if self.error is None:
+                    self.error = error
+
+        self.slots.release()
+
+    def place_and_time(self, pdf_file, destination):
+        with span("distribute_file", pdf_file.path):
+            self.place(pdf_file, destination)
+
+    def place(self, pdf_file, destination):
+        # Remaining files are skipped after an error
+        if self.error is not None:
+            return
+
+        source = pdf_file.path
+        if os.path.isdir(destination):
+            destination = os.path.join(destination, os.path.basename(source))
+
+        if is_placed(pdf_file, destination):
+            with self.lock:
+                self.num_placed["already placed"] += 1
+            return
+
+        devices = (os.stat(source).st_dev, os.stat(os.path.dirname(destination)).st_dev)
+        failed = self.failed_methods.get(devices, ())
+
+        for method in self.methods:
+            if method in failed:
+                continue
+
+            # Replaced, as a copy would be
+            if os.path.lexists(destination):
+                os.remove(destination)
+
+            try:
+                method(source, destination)
+            except OSError as error:
+                # Not supported here, e.g. another filesystem => the next method is tried
+                # The last method has nothing to fall back on
+                if method is self.methods[-1] or not is_unsupported(method, error):
+                    raise
+                with self.lock:
+                    self.failed_methods[devices] = failed = failed + (method,)
+                continue
+
+            # Same modification time as the pdf => seen as placed if the batch is resumed
+            if method is not hardlink_file:
+                shutil.copystat(source, destination)
+
+            with self.lock:
+                self.num_placed[method.__name__] += 1
+            return
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+        if self.num_placed:
+            placed = ", ".join(f"{method}: {num}" for method, num in self.num_placed.items())
+            logging.info(f"Files placed in output folders with {placed}")
+
+        self.raise_error()
@@ -1,25 +1,64 @@
+import sys
+
 from utils import escape_backslash_r
 
+# Most strings seen in the tables repeat across students => each is escaped once and
+# interned, so every entry with the same subject shares a single string
+MAX_ESCAPED_STRINGS = 100000
+escaped_strings = dict()
+
+
+def escape_and_intern(input_string):
+    escaped = escaped_strings.get(input_string)
+    if escaped is not None:
+        return escaped
+
+    escaped = escape_backslash_r(input_string)
+    if escaped is None:
+        return None
+
+    # Module details hold text that is rarely repeated => keep the cache bounded
+    if len(escaped_strings) >= MAX_ESCAPED_STRINGS:
+        escaped_strings.clear()
+
+    escaped = sys.intern(escaped)
+    escaped_strings[input_string] = escaped
+
+    return escaped
+
 
 class GradeEntry:
     """
     Class to store the grades
+
+    Uses __slots__ as a batch holds a very large number of entries
     """
 
+    __slots__ = (
+        "qualification",
+        "subject",
+        "grade",
+        "is_predicted",
+        "is_exam_result",
+        "year",
+    )
+
     def __init__(
         self, qualification, subject, grade, is_predicted, year, is_exam_result
     ):
         if isinstance(grade, str):
-            self.grade = escape_backslash_r(grade)
+            self.grade = escape_and_intern(grade)
         else:
             self.grade = grade
-        self.subject = escape_backslash_r(subject)
-        self.qualification = escape_backslash_r(qualification)
+        self.subject = escape_and_intern(subject)
+        self.qualification = escape_and_intern(qualification)
         self.is_predicted = is_predicted
         self.is_exam_result = is_exam_result
         self.year = year
 
-        self.grade_info = [self.grade, self.subject]
+    @property
+    def grade_info(self):
+        return [self.grade, self.subject]
 
     def __repr__(self):
         return r"Qualification: {} Subject: {} Grade: {} Year: {} Predicted: {} Exam Result: {}".format(
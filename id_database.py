@@ -0,0 +1,183 @@
+"""
+    Contains the SQLite database of the IDs extracted in previous batches
+"""
+
+import os
+import csv
+import sqlite3
+
+import settings
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS batches (
+        batch_number INTEGER PRIMARY KEY,
+        timestamp TEXT
+    );
+    CREATE TABLE IF NOT EXISTS extracted_ids (
+        id INTEGER PRIMARY KEY,
+        batch_number INTEGER NOT NULL REFERENCES batches (batch_number),
+        timestamp TEXT
+    );
+    CREATE INDEX IF NOT EXISTS extracted_ids_batch_number ON extracted_ids (batch_number);
+"""
+
+
+def get_database_paths(database_path):
+    """
+    Returns the path to the SQLite database and to the CSV database it replaces
+
+    A path to a CSV (as used before) is taken to mean the SQLite database next to it
+    """
+    root, ext = os.path.splitext(database_path)
+
+    if ext == ".csv":
+        return root + ".sqlite", database_path
+
+    return database_path, root + ".csv"
+
+
+def read_csv_rows(path_to_csv):
+    """
+    Returns the (id, batch number, timestamp) of each row of a CSV database
+    """
+    id_header = settings.database_headers[settings.database_header_id_num_index]
+    batch_header = settings.database_headers[settings.database_header_batch_index]
+    timestamp_header = settings.database_headers[settings.database_header_timestamp_index]
+
+    rows = []
+    with open(path_to_csv, "r") as database_file:
+        for row in csv.DictReader(database_file, delimiter=","):
+            row_id = row.get(id_header)
+            row_batch_num = row.get(batch_header)
+
+            if row_id is None or row_batch_num is None:
+                raise Exception("Database file has been corrupted")
+
+            rows.append((int(row_id), int(row_batch_num), row.get(timestamp_header)))
+
+    return rows
+
+
+class IdDatabase:
+    """
+    Class that stores the IDs extracted in each batch
+
+    The IDs are the primary key of their table, so checking which IDs have already been
+    extracted is an indexed query rather than a read of the whole file. Each batch is
+    added in a single transaction.
+    If the database doesn't exist but a CSV database does, the CSV is migrated to a new
+    database in one step. The CSV is left as it is.
+    """
+
+    def __init__(self, database_path):
+        self.path_to_database, self.path_to_csv = get_database_paths(database_path)
+
+        if not os.path.exists(self.path_to_database) and os.path.exists(self.path_to_csv):
+            self.migrate_csv()
+
+        self.connection = sqlite3.connect(self.path_to_database)
+        try:
+            self.connection.execute("PRAGMA temp_store = MEMORY")
+
+            with self.connection:
+                self.connection.executescript(SCHEMA)
+        except BaseException:
+            # e.g. not a database => the file isn't left open
+            self.connection.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def migrate_csv(self):
+        """
+        Copies the rows of the CSV database to a new database
+
+        The database is written to a temporary file first, so a failed migration doesn't
+        leave an incomplete database behind
+        """
+        rows = read_csv_rows(self.path_to_csv)
+
+        temporary_path = self.path_to_database + ".tmp"
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+
+        connection = sqlite3.connect(temporary_path)
+        try:
+            with connection:
+                connection.executescript(SCHEMA)
+                # First timestamp of each batch is kept
+                connection.executemany(
+                    "INSERT OR IGNORE INTO batches VALUES (?, ?)",
+                    [(batch_number, timestamp) for _, batch_number, timestamp in rows],
+                )
+                # Sorted by ID, the first row of a repeated ID is kept
+                connection.executemany(
+                    "INSERT OR IGNORE INTO extracted_ids VALUES (?, ?, ?)",
+                    sorted(rows, key=lambda row: row[0]),
+                )
+        finally:
+            connection.close()
+
+        os.replace(temporary_path, self.path_to_database)
+
+    def add_batch(self, batch_number, timestamp, new_ids):
+        """
+        Adds the IDs of a batch. An ID already in the database keeps its first batch.
+        """
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR IGNORE INTO batches VALUES (?, ?)", (batch_number, timestamp)
+            )
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO extracted_ids VALUES (?, ?, ?)",
+                [(int(id_num), batch_number, timestamp) for id_num in new_ids],
+            )
+
+    def is_empty(self):
+        return self.connection.execute("SELECT 1 FROM extracted_ids LIMIT 1").fetchone() is None
+
+    def get_ids(self):
+        return [row[0] for row in self.connection.execute("SELECT id FROM extracted_ids")]
+
+    def get_max_batch_number(self):
+        return self.connection.execute("SELECT MAX(batch_number) FROM batches").fetchone()[0]
+
+    def compare_ids(self, ids):
+        """
+        Returns the set of ids that are not in the database, and the set of IDs in the
+        database that are not in ids
+
+        ids are stored in a temporary table, so both are indexed queries
+        """
+        with self.connection:
+            self.connection.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS query_ids (id INTEGER PRIMARY KEY)"
+            )
+            self.connection.execute("DELETE FROM query_ids")
+            # Sorted => the rows are appended to the end of the index
+            self.connection.executemany(
+                "INSERT INTO query_ids VALUES (?)",
+                [(id_num,) for id_num in sorted({int(id_num) for id_num in ids})],
+            )
+
+        new_ids = {
+            row[0]
+            for row in self.connection.execute(
+                "SELECT id FROM query_ids WHERE id NOT IN (SELECT id FROM extracted_ids)"
+            )
+        }
+        not_in_ids = {
+            row[0]
+            for row in self.connection.execute(
+                "SELECT id FROM extracted_ids WHERE id NOT IN (SELECT id FROM query_ids)"
+            )
+        }
+
+        return new_ids, not_in_ids
@@ -0,0 +1,100 @@
+"""
+    Contains the objects that hold the mappings read from the mapping file
+"""
+
+
+def normalise_qualification(qual):
+    """
+    Qualification without whitespace or non-printable characters, as used for the keys
+    of the internal mapping
+    """
+    return "".join(e for e in str(qual) if e.isprintable() and not e.isspace())
+
+
+class QualificationMapping(dict):
+    """
+    Class that maps the normalised name of a qualification, as written in the pdfs,
+    to its internal name
+
+    Each qualification read from a table is normalised once and the result remembered,
+    so validating and mapping a qualification is a single dict lookup.
+    The mapping should not be changed once it is in use.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        # Qualification as read from a table => (is valid, internal name)
+        self.resolved = dict()
+
+    def resolve(self, qual):
+        resolved = self.resolved.get(qual)
+        if resolved is not None:
+            return resolved
+
+        # Only needed the first time a qualification is seen
+        from pandas import isna
+
+        # Missing values are not remembered, NaN is not equal to itself
+        if isna(qual):
+            return False, None
+
+        key = normalise_qualification(qual)
+        resolved = (key in self, self.get(key))
+        self.resolved[qual] = resolved
+
+        return resolved
+
+    def resolve_column(self, quals):
+        """
+        Resolves a column of qualifications, each distinct value is resolved once
+
+        Returns arrays of whether each row holds a valid qualification and of its
+        internal name.
+        """
+        internal_names = dict()
+        for qual in quals.dropna().unique():
+            is_valid, internal_name = self.resolve(qual)
+            if is_valid:
+                internal_names[qual] = internal_name
+
+        return (
+            quals.isin(list(internal_names)).to_numpy(),
+            quals.map(internal_names).to_numpy(),
+        )
+
+    def is_valid(self, qual):
+        return self.resolve(qual)[0]
+
+    def get_internal_name(self, qual):
+        return self.resolve(qual)[1]
+
+
+class SubjectCategories:
+    """
+    Class that finds whether a subject counts as Maths, Physics or Further Maths for a
+    qualification
+
+    The subject sheets of the mapping file are compiled once into a single dict, keyed by
+    the qualification and the lowercase subject name, so each entry is a single lookup.
+    """
+
+    def __init__(self, math_mapping, physics_mapping, fm_mapping):
+        # (qualification, lowercase subject) => category
+        self.categories = dict()
+
+        # A subject in more than one sheet is given the first category, in the order
+        # math, physics, fm => those later in the order are added first and overwritten
+        for category, mapping in (
+            ("fm", fm_mapping),
+            ("physics", physics_mapping),
+            ("math", math_mapping),
+        ):
+            for qualification, subjects in mapping.items():
+                for subject in subjects:
+                    self.categories[(qualification, str(subject).lower())] = category
+
+    def get_category(self, qualification, subject):
+        return self.categories.get(
+            (qualification, subject.lower()), "additional_subjects"
+        )
@@ -0,0 +1,56 @@
+"""
+    Contains the helpers used to run the stages of a batch at the same time
+"""
+
+import threading
+
+from queue import Queue
+
+# Marks the end of the items in a queue
+END_OF_ITEMS = object()
+
+
+class StageError:
+    """
+    Class that carries an exception raised in a background thread to the caller
+    """
+
+    def __init__(self, error):
+        self.error = error
+
+
+def run_in_background(iterable, maxsize):
+    """
+    Generator that consumes an iterable in a background thread
+
+    Items are passed through a queue holding at most maxsize items, so the thread waits
+    when it gets too far ahead of the caller. Items are yielded in order, and any exception
+    raised by the iterable is raised again in the caller.
+    """
+    items = Queue(maxsize=maxsize)
+
+    def produce():
+        try:
+            for item in iterable:
+                items.put(item)
+        except BaseException as error:
+            items.put(StageError(error))
+        else:
+            items.put(END_OF_ITEMS)
+
+    # Daemon thread => doesn't keep the program alive if the caller stops early
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+
+    while True:
+        item = items.get()
+
+        if item is END_OF_ITEMS:
+            break
+        elif isinstance(item, StageError):
+            raise item.error
+
+        yield item
+
+    thread.join()
+
@@ -0,0 +1,76 @@
+"""
+    File to rebuild the grades workbook of a batch from its snapshot, without the pdfs
+"""
+
+import argparse
+
+from utils import (
+    get_current_time,
+    load_mappings,
+)
+import settings
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+        description="Rebuilds the grades workbook of a batch from the tables saved by "
+        "extract_table.py, applying any changes to the mapping file. "
+        "The batch is set in settings.py"
+    )
+    return parser.parse_args()
+
+
+def main(arguments):
+    # Imported here, so the script starts (e.g. with --help) without loading pandas
+    from tqdm import tqdm
+
+    from batch_snapshot import BatchSnapshot
+    from extracted_students import ExtractedStudents
+    from student import Student
+
+    start_time = get_current_time()
+    print(f"Start Time: {start_time}")
+
+    # Mappings are reloaded, so any changes to the mapping file are applied
+    internal_mapping, math_mapping, phys_mapping, fm_mapping = load_mappings()
+
+    snapshot = BatchSnapshot(settings.path_to_snapshot)
+    applicant_ids, marker_allocation = snapshot.load_info()
+    journal = snapshot.read_journal()
+
+    # Interrupted batch => the applicants not in the journal have no tables to rebuild from
+    missing_ids = [app_id for app_id in applicant_ids if app_id not in journal]
+    if missing_ids:
+        raise ValueError(
+            f"Batch {settings.batch_number} was not finished: {len(missing_ids)} of "
+            f"{len(applicant_ids)} applicants have not been extracted. "
+            "Complete it with python extract_table.py --resume first"
+        )
+
+    # Same allocation to markers as when the batch was extracted
+    all_students = ExtractedStudents(
+        applicant_ids, math_mapping, phys_mapping, fm_mapping, marker_allocation
+    )
+
+    # Issues importing the pdfs, e.g. quarantined for going over their budget
+    for app_id, issue in journal.items():
+        if issue is not None:
+            all_students.add_import_issue(app_id, issue)
+
+    print("Rebuilding workbook for {} students".format(len(applicant_ids)))
+
+    for counter, app_id in enumerate(tqdm(applicant_ids, desc="Table Processing: ")):
+        grade_tables, grade_counters, _ = snapshot.load_student(app_id)
+
+        all_students.add_student_sequentially(
+            Student(app_id, grade_tables, grade_counters, internal_mapping), counter
+        )
+
+    all_students.write_to_excel(settings.output_path)
+
+    end_time = get_current_time()
+    print(f"End Time: {end_time}")
+
+
+if __name__ == "__main__":
+    main(parse_arguments())
@@ -36,10 +36,11 @@ mapping_name = 'mapping.xlsx'
 # Path to banner file
 path_to_banner = 'Excel from Banner'
 
-# Path to database CSV
+# Path to database of previously extracted IDs
 path_to_database = 'data'
-# Name of database CSV
-database_name = 'previously_extracted.csv'
+# Name of database (SQLite). If it doesn't exist, a CSV database with the same name,
+# e.g. previously_extracted.csv, is migrated to it
+database_name = 'previously_extracted.sqlite'
 
 # Path to output directory
 output_path = 'output'
@@ -69,6 +70,57 @@ database_header_timestamp_index = 2
 
 terminate_if_batch_num_repeated = True
 
+# Number of processes used to extract tables from the pdfs
+# Set to 1 to process the pdfs one at a time
+num_workers = 1
+
+# If True, the text of each pdf is searched first (with pypdf) so only the pages containing
+# the tables of interest are read by tabula. Falls back to reading every page if the text
+# can't be searched.
+locate_pages_from_text = True
+
+# If True, the tables extracted from each pdf are stored on disk, so pdfs that have
+# already been extracted (e.g. when a batch is rerun) skip tabula
+use_table_cache = True
+# Largest size of the cache in bytes. Least recently used pdfs are removed beyond this
+table_cache_max_bytes = 2 * 1024 ** 3
+
+# If True, extract_table.py also prints the subject names found in the batch (as in
+# extract_subject_names.py), using the same tables so the pdfs are only read once
+report_subject_names = False
+
+# Largest number of students waiting between the stages of extract_table.py
+# (extraction, building each student, writing rows, copying files)
+pipeline_queue_size = 8
+
+# How the pdfs are placed in the marker folders and the pool
+# "clone"    - shares the data of the original pdf until either is changed (reflink), or
+#              copies it inside the kernel. Falls back to a copy if neither is supported
+# "hardlink" - links to the original pdf, falling back as "clone". Annotating a pdf in
+#              a marker folder also changes the original and the pool
+# "copy"     - always copies the pdf
+pdf_distribution_mode = "clone"
+# Number of threads placing the pdfs while the batch is extracted
+num_distribution_threads = 4
+
+# Longest time (in seconds) tabula may spend on a single pdf, and most pages searched
+# for the target tables before the exit table is found
+# A pdf over either is quarantined: it is left out of the extraction and marked in the
+# "Issues Importing?" column, so it can be entered by hand. None => no limit
+# The time is checked between pages. A pdf still being read twice the time after its
+# worker started on it is also quarantined, even if a page never finishes, as the pdfs
+# are then read in a worker process (even with num_workers = 1) that can be stopped
+max_seconds_per_pdf = 300
+max_pages_per_pdf = 60
+
+# If True, extract_table.py times each stage (e.g. each page read by tabula) and writes
+# a performance report next to the log file
+record_timings = True
+
+# If True, the mappings read from the mapping file are stored in the database folder
+# and reused until the mapping file is changed
+use_mapping_cache = True
+
 #########################################
 ############# END OF INPUTS #############
 #########################################
@@ -104,20 +156,31 @@ assert (
 
 path_to_database_of_extracted_pdfs = get_full_file_path(os.path.join(base_directory, path_to_database), database_name)
 
+path_to_table_cache = get_full_path(os.path.join(base_directory, path_to_database, "table_cache"))
+path_to_mapping_cache = get_full_file_path(os.path.join(base_directory, path_to_database), "mapping_cache.pickle")
+
 output_path = get_full_path(os.path.join(base_directory, output_path))
 
 path_to_pdf_pool = os.path.join(base_directory, output_path, "pool")
 path_to_pdf_pool = get_full_path(path_to_pdf_pool)
 
-if not os.path.exists(path_to_pdf_pool):
-    os.makedirs(path_to_pdf_pool)
-
-if not os.path.exists(path_to_database_of_extracted_pdfs):
-    os.makedirs(os.path.join(base_directory, path_to_database))
-
 output_filename = f"grades_{batch_number}.xlsx"
 
+snapshot_folder = f"snapshot_{batch_number}"
+path_to_snapshot = get_full_path(os.path.join(output_path, snapshot_folder))
+
 log_filename = f"execution_log_{batch_number}.log"
 path_to_log = get_full_file_path(output_path, log_filename)
+quarantine_filename = f"quarantine_{batch_number}.csv"
+path_to_quarantine = get_full_file_path(output_path, quarantine_filename)
+# Summary of the time spent in each stage, and every timing span
+path_to_performance_report = get_full_file_path(output_path, f"performance_{batch_number}.json")
+path_to_performance_spans = get_full_file_path(output_path, f"performance_{batch_number}.csv")
 ids_in_folder_file = f"id_log_{batch_number}.txt"
 path_to_folder_ids = get_full_file_path(output_path, ids_in_folder_file)
+
+
+def create_directories():
+    """Creates the output and database folders, called by the scripts before they start"""
+    os.makedirs(path_to_pdf_pool, exist_ok=True)
+    os.makedirs(os.path.join(base_directory, path_to_database), exist_ok=True)
@@ -6,10 +6,11 @@ from collections import Counter
 from pdf_strings import (
     desired_tables,
     detail_string,
-    valid_exams,
     ib_permutations,
 )
 
+import numpy as np
+
 from pandas import isna
 
 from grade_entry import GradeEntry
@@ -111,15 +112,12 @@ class Student:
                     if "H" in grade:
                         # If higher level, remove H
                         entry.grade = grade.replace("H", "")
-                        entry.grade_info[0] = entry.grade
                     elif "h" in grade:
                         entry.grade = grade.replace("h", "")
-                        entry.grade_info[0] = entry.grade
 
                     # Get actual subject name
                     subject = entry.subject.split('Value:')[0].split('Predicted Grade:')[0].split("Grade:")[0].strip()
                     entry.subject = subject
-                    entry.grade_info[1] = subject
 
                 self.which_grades[grade_entries_key] = grade_entries
 
@@ -225,33 +223,83 @@ class Student:
 
         return output
 
-    def completed_grade_entries(self):
-        if self.completed_qualifications is None:
-            return None
+    def get_years(self, input_qualification):
+        # Dates are written as month-year => keep the part after the last "-"
+        return (
+            input_qualification["Date"]
+            .astype(object)
+            .str.rsplit("-", n=1)
+            .str[-1]
+            .to_numpy()
+        )
 
-        for row in self.completed_qualifications.index:
+    def get_detailed_mask(self, input_qualification):
+        # Same check as is_detailed_entry, for every row at once
+        return (input_qualification["Date"] == detail_string()).to_numpy()
+
+    def table_entries(
+        self,
+        input_qualification,
+        qualifications,
+        grades,
+        predicted,
+        exam,
+        has_grade=None,
+    ):
+        """
+        Converts the rows of a table to grade entries
+
+        qualifications and grades are Series with a value for every row. The rows to
+        convert are picked with column-wise masks, only the module detail rows are parsed
+        one at a time. If has_grade is given, only the rows with a grade are converted and
+        only those without one are checked for module details.
+        """
+        is_valid, internal_names = self.internal_mapping.resolve_column(qualifications)
+        detailed = self.get_detailed_mask(input_qualification)
+
+        if has_grade is None:
+            is_entry = is_valid
+            is_detail = detailed & ~is_valid
+        else:
+            is_entry = has_grade & is_valid
+            is_detail = ~has_grade & detailed
 
-            if self.is_qual_valid(self.completed_qualifications["Exam"][row]):
+        years = self.get_years(input_qualification)
+        subjects = input_qualification["Subject"].to_numpy()
+        grades = grades.to_numpy()
 
-                qual = self.get_valid_qualification(self.completed_qualifications['Exam'][row])
+        output = []
 
-                entry = GradeEntry(
-                    qual,
-                    self.completed_qualifications["Subject"][row],
-                    self.completed_qualifications["Grade"][row],
-                    False,
-                    self.completed_qualifications["Date"][row].split("-")[-1],
-                    False,
+        for position in np.flatnonzero(is_entry | is_detail):
+            if is_entry[position]:
+                output.append(
+                    GradeEntry(
+                        internal_names[position],
+                        subjects[position],
+                        grades[position],
+                        predicted,
+                        years[position],
+                        exam,
+                    )
+                )
+            else:
+                output += self.handle_detailed_entry(
+                    input_qualification, input_qualification.index[position]
                 )
 
-                self.completed_entries.append(entry)
+        return output
 
-            elif self.is_detailed_entry(self.completed_qualifications, row):
+    def completed_grade_entries(self):
+        if self.completed_qualifications is None:
+            return None
 
-                detailed_entries = self.handle_detailed_entry(
-                    self.completed_qualifications, row
-                )
-                self.completed_entries += detailed_entries
+        self.completed_entries += self.table_entries(
+            self.completed_qualifications,
+            self.completed_qualifications["Exam"],
+            self.completed_qualifications["Grade"],
+            False,
+            False,
+        )
 
         return self.completed_entries
 
@@ -259,26 +307,13 @@ class Student:
         if self.exam_results is None:
             return None
 
-        for row in self.exam_results.index:
-
-            if self.is_qual_valid(self.exam_results["Exam Level"][row]):
-
-                qual = self.get_valid_qualification(self.exam_results['Exam Level'][row])
-                entry = GradeEntry(
-                    qual,
-                    self.exam_results["Subject"][row],
-                    self.exam_results["Grade"][row],
-                    False,
-                    self.exam_results["Date"][row].split("-")[-1],
-                    True,
-                )
-
-                self.results_entries.append(entry)
-
-            elif self.is_detailed_entry(self.exam_results, row):
-
-                detailed_entries = self.handle_detailed_entry(self.exam_results, row)
-                self.results_entries += detailed_entries
+        self.results_entries += self.table_entries(
+            self.exam_results,
+            self.exam_results["Exam Level"],
+            self.exam_results["Grade"],
+            False,
+            True,
+        )
 
         return self.results_entries
 
@@ -286,85 +321,41 @@ class Student:
         if self.uncompleted_qualifications is None:
             return None
 
-        for row in self.uncompleted_qualifications.index:
-
-            is_pred_grade = isna(
-                self.uncompleted_qualifications["Predicted\rGrade"][row]
-            )
-            is_grade = isna(self.uncompleted_qualifications["Grade"][row])
-
-            if is_pred_grade ^ is_grade:
-
-                if is_pred_grade:
-                    valid_grade = self.uncompleted_qualifications["Grade"][row]
-                else:
-                    valid_grade = self.uncompleted_qualifications["Predicted\rGrade"][
-                        row
-                    ]
-
-                if isna(self.uncompleted_qualifications["Exam"][row]):
-                    qualification = self.uncompleted_qualifications["Body"][row]
-                else:
-                    qualification = self.uncompleted_qualifications["Exam"][row]
-
-                if self.is_qual_valid(qualification):
+        table = self.uncompleted_qualifications
 
-                    qualification = self.get_valid_qualification(qualification)
+        predicted_grades = table["Predicted\rGrade"]
+        grades = table["Grade"]
 
-                    entry = GradeEntry(
-                        qualification,
-                        self.uncompleted_qualifications["Subject"][row],
-                        valid_grade,
-                        True,
-                        self.uncompleted_qualifications["Date"][row].split("-")[-1],
-                        False,
-                    )
-                    self.predicted_entries.append(entry)
-
-            elif (not is_pred_grade) & (not is_grade):
+        is_pred_grade = predicted_grades.isna().to_numpy()
+        is_grade = grades.isna().to_numpy()
+        is_unnamed = grades.astype(str).str.contains("Unnamed", regex=False).to_numpy()
 
-                if "Unnamed" in str(self.uncompleted_qualifications["Grade"][row]):
-                    valid_grade = self.uncompleted_qualifications["Predicted\rGrade"][
-                        row
-                    ]
-                else:
-                    valid_grade = self.uncompleted_qualifications["Grade"][row]
+        # Predicted grade is used when there is no grade, or the grade is a header
+        use_predicted = ~is_pred_grade & (is_grade | is_unnamed)
+        # Rows without either grade may be module details
+        has_grade = ~(is_pred_grade & is_grade)
 
-                if isna(self.uncompleted_qualifications["Exam"][row]):
-                    qualification = self.uncompleted_qualifications["Body"][row]
-                else:
-                    qualification = self.uncompleted_qualifications["Exam"][row]
-
-                if self.is_qual_valid(qualification):
-
-                    qualification = self.get_valid_qualification(qualification)
-
-                    entry = GradeEntry(
-                        qualification,
-                        self.uncompleted_qualifications["Subject"][row],
-                        valid_grade,
-                        True,
-                        self.uncompleted_qualifications["Date"][row].split("-")[-1],
-                        False,
-                    )
-                    self.predicted_entries.append(entry)
+        # Object columns => each grade keeps its own type
+        valid_grades = predicted_grades.astype(object).where(
+            use_predicted, grades.astype(object)
+        )
 
-            elif self.is_detailed_entry(self.uncompleted_qualifications, row):
+        # Qualification is in the exam column, or the body if there is none
+        qualifications = table["Exam"].where(table["Exam"].notna(), table["Body"])
 
-                detailed_entries = self.handle_detailed_entry(self.uncompleted_qualifications, row)
-                self.predicted_entries += detailed_entries
+        self.predicted_entries += self.table_entries(
+            table,
+            qualifications,
+            valid_grades,
+            True,
+            False,
+            has_grade=has_grade,
+        )
 
         return self.predicted_entries
 
     def is_qual_valid(self, qual):
-        if isna(qual):
-            return False
-
-        qual = ''.join(char for char in str(qual) if char.isprintable() and not char.isspace())
-        if qual in [''.join(char for char in exam if char.isprintable() and not char.isspace()) for exam in valid_exams(self.internal_mapping)]:
-            return True
-        else:
-            return False
+        return self.internal_mapping.is_valid(qual)
 
     def get_valid_qualification(self, qual):
-        return self.internal_mapping.get(''.join(e for e in str(qual) if e.isprintable() and not e.isspace()))
+        return self.internal_mapping.get_internal_name(qual)
@@ -0,0 +1,152 @@
+"""
+    Contains the object that tallies the subject names found in the extracted tables
+"""
+
+from pdf_strings import (
+    desired_tables,
+    ib_permutations,
+    detail_string,
+)
+from pandas import isna
+
+from utils import escape_backslash_r
+
+
+def all_valid_quals(mapping):
+    return set(mapping.values())
+
+
+class SubjectNameTally:
+    """
+    Class that counts the Maths, Physics and Further Maths subject names for each valid qualification
+
+    Uses a permissive string search, so every name found should be checked by the user
+    before it is copied into the mapping file
+    """
+
+    def __init__(self, internal_mapping):
+        self.internal_mapping = internal_mapping
+
+        # Initialise subject names dictionaries
+        self.math_names = {}
+        self.phys_names = {}
+        self.fm_names = {}
+        self.math_totals = {}
+        self.phys_totals = {}
+        self.fm_totals = {}
+
+        for qual in all_valid_quals(self.internal_mapping):
+            self.math_names[qual] = {}
+            self.phys_names[qual] = {}
+            self.fm_names[qual] = {}
+            self.math_totals[qual] = 0
+            self.phys_totals[qual] = 0
+            self.fm_totals[qual] = 0
+
+    def is_qual_valid(self, qual):
+        return self.internal_mapping.is_valid(qual)
+
+    def get_valid_qualification(self, qual):
+        return self.internal_mapping.get_internal_name(qual)
+
+    @staticmethod
+    def is_detailed_entry(input_qualification, rowCounter):
+        target = input_qualification["Date"][rowCounter]
+        if not isinstance(target, str):
+            return False
+
+        if target not in detail_string():
+            return False
+
+        return True
+
+    def count_subject(self, qual, subject):
+
+        if subject in self.math_names[qual].keys():
+            self.math_names[qual][subject] += 1
+            self.math_totals[qual] += 1
+
+        elif subject in self.phys_names[qual].keys():
+            self.phys_names[qual][subject] += 1
+            self.phys_totals[qual] += 1
+
+        elif subject in self.fm_names[qual].keys():
+            self.fm_names[qual][subject] += 1
+            self.fm_totals[qual] += 1
+
+        else:
+            if 'math' in subject.lower() and 'further' not in subject.lower():
+                self.math_names[qual][subject] = 1
+                self.math_totals[qual] += 1
+
+            elif 'further' in subject.lower() and 'math' in subject.lower():
+                self.fm_names[qual][subject] = 1
+                self.fm_totals[qual] += 1
+
+            elif 'physics' in subject.lower():
+                self.phys_names[qual][subject] = 1
+                self.phys_totals[qual] += 1
+
+    def add_tables(self, grade_tables, grade_counters):
+        """
+        Counts the subject names in the target tables of a single pdf
+        """
+        target_tables = desired_tables()
+
+        for table, header_counter in zip(grade_tables, grade_counters):
+
+            if header_counter == target_tables[0]:
+                qual_key = 'Exam'
+            elif header_counter == target_tables[1]:
+                qual_key = 'Exam'
+            elif header_counter == target_tables[2]:
+                qual_key = 'Exam Level'
+
+            for row in table.index:
+
+                if self.is_qual_valid(table[qual_key][row]):
+                    qual = self.get_valid_qualification(table[qual_key][row])
+
+                    subject = escape_backslash_r(str(table['Subject'][row]))
+
+                    self.count_subject(qual, subject)
+
+                elif self.is_detailed_entry(table, row):
+
+                    if not isna(table[qual_key][row - 1]):
+                        qual = table[qual_key][row - 1]
+                    else:
+                        qual = None
+
+                    if self.is_qual_valid(qual):
+                        qual = self.get_valid_qualification(qual)
+
+                        if qual in ib_permutations():
+
+                            all_module_details = table["Body"][row]
+                            individual_modules = all_module_details.split("Title:")[1:]
+
+                            for module in individual_modules:
+
+                                subject = module.split("Date:")[0].split('Value:')[0].split('Predicted Grade:')[0].split("Grade:")[0].strip()
+
+                                self.count_subject(qual, subject)
+
+    def print_report(self):
+        print('\r\r\n\nSubject names for MATHEMATICS found in this batch, per valid qualification, with number of occurances:')
+        for qual in self.math_names:
+            print('\r\nQualification: {}'.format(qual))
+            for name, val in self.math_names[qual].items():
+                print("{:<36}: {:.1%}%".format(name, (val/self.math_totals[qual])))
+
+        print('\r\n\r\nSubject names for PHYSICS found in this batch, per valid qualification, with number of occurances:')
+        for qual in self.phys_names:
+            print('\r\nQualification: {}'.format(qual))
+            for name, val in self.phys_names[qual].items():
+                print("{:<36}: {:.1%}%".format(name, (val/self.phys_totals[qual])))
+
+        print('\r\n\r\nSubject names for FURTHER MATHEMATICS found in this batch, per valid qualification, with number of occurances:')
+        for qual in self.fm_names:
+            print('\r\nQualification: {}'.format(qual))
+            for name, val in self.fm_names[qual].items():
+                print("{:<40}: {:.1%}%".format(name, (val/self.fm_totals[qual])))
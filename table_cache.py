@@ -0,0 +1,205 @@
+"""
+    Contains the on-disk cache of the tables extracted from each pdf
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import logging
+
+from collections import Counter
+from uuid import uuid4
+
+from numpy import nan
+from pandas import read_parquet, read_pickle
+
+# Part of every key => bump whenever the tables extracted from a pdf change (e.g. a fix to
+# extract_grade_tables or fix_broken_table), so entries written before aren't used
+CACHE_VERSION = 1
+
+
+def save_tables(folder, grade_tables, grade_counters, found_exit):
+    """
+    Writes the target tables of a pdf to a new folder
+
+    Each table is written to its own parquet file. If a table can't be stored as parquet
+    (e.g. a column mixes numbers and strings after fixing a broken table), it is pickled.
+    The header counters and exit flag are written to a json file.
+    """
+    os.makedirs(folder)
+
+    table_files = []
+    for index, table in enumerate(grade_tables):
+        table_file = f"table_{index}.parquet"
+        try:
+            table.to_parquet(os.path.join(folder, table_file))
+        except (ImportError, TypeError, ValueError):
+            # pyarrow not installed or the table can't be converted
+            if os.path.exists(os.path.join(folder, table_file)):
+                os.remove(os.path.join(folder, table_file))
+            table_file = f"table_{index}.pickle"
+            table.to_pickle(os.path.join(folder, table_file))
+        table_files.append(table_file)
+
+    with open(os.path.join(folder, "tables.json"), "w") as file:
+        json.dump(
+            {
+                "table_files": table_files,
+                "counters": [dict(counter) for counter in grade_counters],
+                "found_exit": found_exit,
+            },
+            file,
+        )
+
+
+def load_tables(folder):
+    """
+    Reads the target tables of a pdf written by save_tables
+    Returns the tables, their header counters and whether the exit table was found
+    """
+    with open(os.path.join(folder, "tables.json"), "r") as file:
+        contents = json.load(file)
+
+    grade_tables = []
+    for table_file in contents["table_files"]:
+        if table_file.endswith(".parquet"):
+            # Missing text is read back as None, tabula gives NaN
+            table = read_parquet(os.path.join(folder, table_file)).fillna(nan)
+        else:
+            table = read_pickle(os.path.join(folder, table_file))
+        grade_tables.append(table)
+
+    grade_counters = [Counter(counter) for counter in contents["counters"]]
+
+    return grade_tables, grade_counters, contents["found_exit"]
+
+
+def get_file_hash(path_to_file):
+    file_hash = hashlib.sha256()
+    with open(path_to_file, "rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            file_hash.update(chunk)
+
+    return file_hash.hexdigest()
+
+
+class TableCache:
+    """
+    Class that stores the target tables extracted from each pdf on disk
+
+    Entries are keyed by the SHA-256 of the pdf and the extraction parameters, so the same
+    pdf is found again under any name or batch. The hash of each pdf is kept for its path,
+    size and modification time, so an unchanged pdf isn't hashed again. Reading an entry marks it as recently used,
+    and the least recently used entries are removed once the cache is larger than max_bytes.
+    """
+
+    def __init__(self, path_to_cache, max_bytes):
+        self.path_to_cache = path_to_cache
+        self.max_bytes = max_bytes
+
+        if not os.path.exists(self.path_to_cache):
+            os.makedirs(self.path_to_cache, exist_ok=True)
+
+    def get_pdf_hash(self, pdf_file):
+        """
+        SHA-256 of a pdf, remembered for its path, size and modification time
+        => a pdf that hasn't changed is only read once, not on every run
+        """
+        file_key = json.dumps([os.path.realpath(pdf_file.path), pdf_file.size, pdf_file.mtime])
+        hash_path = os.path.join(
+            self.path_to_cache, ".file_hashes", hashlib.sha256(file_key.encode()).hexdigest()
+        )
+
+        try:
+            with open(hash_path, "r") as file:
+                return file.read()
+        except OSError:
+            pass
+
+        file_hash = get_file_hash(pdf_file.path)
+
+        # Written to a temporary file first, as another process may hash the same pdf
+        os.makedirs(os.path.dirname(hash_path), exist_ok=True)
+        temporary_path = f"{hash_path}.{uuid4().hex}"
+        with open(temporary_path, "w") as file:
+            file.write(file_hash)
+        os.replace(temporary_path, hash_path)
+
+        return file_hash
+
+    def make_key(self, pdf_file, parameters):
+        key = hashlib.sha256(self.get_pdf_hash(pdf_file).encode())
+        key.update(json.dumps([CACHE_VERSION, parameters], sort_keys=True).encode())
+
+        return key.hexdigest()
+
+    def get_entry_path(self, key):
+        return os.path.join(self.path_to_cache, key)
+
+    def load(self, key):
+        """
+        Returns the tables, header counters and exit flag for a key
+        None is returned if it is not in the cache
+        """
+        entry_path = self.get_entry_path(key)
+        if not os.path.exists(entry_path):
+            return None
+
+        try:
+            extracted = load_tables(entry_path)
+        except (OSError, ValueError, KeyError) as error:
+            logging.warning(f"Cache entry {key} could not be read: {error}")
+            return None
+
+        # Modification time of the folder records when it was last used
+        os.utime(entry_path)
+
+        return extracted
+
+    def store(self, key, grade_tables, grade_counters, found_exit):
+        entry_path = self.get_entry_path(key)
+        if os.path.exists(entry_path):
+            return
+
+        # Written to a temporary folder first, so a partial entry is never read
+        # Another process may store the same pdf at the same time
+        temporary_path = os.path.join(self.path_to_cache, f".{key}.{uuid4().hex}")
+        save_tables(temporary_path, grade_tables, grade_counters, found_exit)
+
+        try:
+            os.rename(temporary_path, entry_path)
+        except OSError:
+            shutil.rmtree(temporary_path, ignore_errors=True)
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the cache fits in max_bytes
+        """
+        entries = []
+        total_bytes = 0
+
+        for entry in os.scandir(self.path_to_cache):
+            if not entry.is_dir() or entry.name.startswith("."):
+                continue
+
+            entry_bytes = sum(
+                table_file.stat().st_size for table_file in os.scandir(entry.path)
+            )
+            entries.append((entry.stat().st_mtime, entry_bytes, entry.path))
+            total_bytes += entry_bytes
+
+        # Oldest first
+        entries.sort()
+
+        num_removed = 0
+        for _, entry_bytes, entry_path in entries:
+            if total_bytes <= self.max_bytes:
+                break
+
+            shutil.rmtree(entry_path, ignore_errors=True)
+            total_bytes -= entry_bytes
+            num_removed += 1
+
+        if num_removed:
+            logging.info(f"{num_removed} entries removed from table cache")
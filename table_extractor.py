@@ -0,0 +1,276 @@
+"""
+    Contains the object that reads tables from the pdfs with tabula
+"""
+
+import json
+import time
+import logging
+import subprocess
+
+import tabula
+from numpy import nan
+from pandas import DataFrame, to_numeric
+from tabula.backend import TabulaVm
+
+from timing import span
+
+# Options used for every read of a pdf
+TABULA_OPTIONS = {"lattice": True, "guess": True}
+
+
+def tables_from_json(raw_json):
+    """
+    Converts the tables written as JSON by tabula-java to DataFrames, with the first row of
+    each table as its header
+
+    Same conversion as tabula.read_pdf with pandas_options={"header": 0}, done here rather
+    than through the private function of tabula-py that does it
+    """
+    tables = []
+
+    for table in raw_json:
+        if len(table["data"]) == 0:
+            continue
+
+        rows = [[cell["text"] or nan for cell in row] for row in table["data"]]
+        columns = rows.pop(0)
+
+        # Missing names are numbered in order, as pandas does
+        num_unnamed = 0
+        for index, column in enumerate(columns):
+            if column is nan:
+                columns[index] = f"Unnamed: {num_unnamed}"
+                num_unnamed += 1
+
+        # Repeated names are given a ".1", ".2", etc. suffix, as pandas does
+        counts = dict()
+        for index, column in enumerate(columns):
+            count = counts.get(column, 0)
+            while count > 0:
+                counts[column] = count + 1
+                column = f"{column}.{count}"
+                count = counts.get(column, 0)
+
+            columns[index] = column
+            counts[column] = count + 1
+
+        table = DataFrame(data=rows, columns=columns)
+        for column in table.columns:
+            table[column] = to_numeric(table[column], errors="ignore")
+
+        tables.append(table)
+
+    return tables
+
+
+class PdfBudgetExceeded(Exception):
+    """
+    Exception raised when a pdf takes longer or has more pages to read than it is allowed
+
+    Attributes:
+        limit -- limit that was hit, "time" or "pages"
+        message -- explanation of the error
+    """
+
+    def __init__(self, limit, message):
+        super().__init__(message)
+        self.limit = limit
+        self.message = message
+
+
+class PdfBudget:
+    """
+    Class that limits the time spent by tabula on a pdf, and the number of its pages
+    searched for the target tables
+
+    The time is checked before each page is parsed, so a page already being parsed isn't
+    stopped. Pages are counted as they are searched, up to the exit table, so the pages
+    after it don't count. A limit of None is not checked.
+    """
+
+    def __init__(self, file, max_seconds, max_pages):
+        self.file = file
+        self.max_seconds = max_seconds
+        self.max_pages = max_pages
+
+        self.start_time = time.monotonic()
+        self.num_pages = 0
+
+    def check_time(self):
+        elapsed = time.monotonic() - self.start_time
+        if self.max_seconds is not None and elapsed > self.max_seconds:
+            raise PdfBudgetExceeded(
+                "time", f"{self.file} took more than {self.max_seconds} s to read"
+            )
+
+    def count_page(self):
+        self.num_pages += 1
+
+        if self.max_pages is not None and self.num_pages > self.max_pages:
+            raise PdfBudgetExceeded(
+                "pages", f"{self.file} has more than {self.max_pages} pages to search"
+            )
+
+
+class TableExtractor:
+    """
+    Class that keeps a single tabula-java session alive for every pdf and page of a run
+
+    The JVM is started in process (through jpype) on the first read, and not before, so an
+    extractor can be created before forking worker processes. Each process that reads
+    tables should use its own extractor.
+
+    The tables of each page are cached for the current pdf, so a page is only parsed once
+    no matter how many times it is read. This includes reads of the next page when checking
+    for broken tables.
+
+    If a budget is set, its time is checked before every page parsed by tabula.
+
+    Use as a context manager so the last opened pdf is closed,
+        with TableExtractor() as extractor:
+            tables = extractor.read_page(file, 2)
+    """
+
+    def __init__(self):
+        self.is_started = False
+        # False if tabula-java can't be run in process => one java process per call
+        self.is_in_process = True
+
+        self.java = dict()
+
+        # Only one pdf is kept open at a time
+        self.open_file = None
+        self.document = None
+        self.object_extractor = None
+
+        # Tables of the pages already read, keyed by (file, page number)
+        # Only holds the pages of a single pdf at a time
+        self.page_cache = dict()
+
+        # PdfBudget of the pdf being read, if any
+        self.budget = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def start(self):
+        if self.is_started:
+            return
+
+        # Starts the JVM with tabula-java on the class path, if not already running
+        with span("jvm_start"):
+            tabula_vm = TabulaVm(java_options=["-Dfile.encoding=UTF8"], silent=True)
+
+        if tabula_vm.tabula is None:
+            logging.warning("tabula-java could not be run in process, using subprocess")
+            self.is_in_process = False
+        else:
+            from java.io import File
+            from java.lang import StringBuilder
+            from org.apache.pdfbox.pdmodel import PDDocument
+            from technology.tabula import ObjectExtractor
+            from technology.tabula.extractors import SpreadsheetExtractionAlgorithm
+            from technology.tabula.writers import JSONWriter
+
+            self.java = {
+                "File": File,
+                "StringBuilder": StringBuilder,
+                "PDDocument": PDDocument,
+                "ObjectExtractor": ObjectExtractor,
+                # Equivalent to lattice=True in tabula.read_pdf
+                "algorithm": SpreadsheetExtractionAlgorithm(),
+                "writer": JSONWriter(),
+            }
+
+        self.is_started = True
+
+    def close(self):
+        if self.object_extractor is not None:
+            self.object_extractor.close()
+
+        self.open_file = None
+        self.document = None
+        self.object_extractor = None
+
+        self.page_cache.clear()
+
+    def get_cached_page(self, file, page_number):
+        # Moving onto a new pdf => pages of the previous one are no longer needed
+        if self.page_cache and (file, page_number) not in self.page_cache:
+            cached_file, _ = next(iter(self.page_cache))
+            if cached_file != file:
+                self.page_cache.clear()
+
+        return self.page_cache.get((file, page_number))
+
+    def open_pdf(self, file):
+        # Reuse the loaded document if it is the same pdf
+        if file == self.open_file:
+            return self.object_extractor
+
+        self.close()
+
+        self.document = self.java["PDDocument"].load(self.java["File"](file))
+        # Closing the object extractor also closes the document
+        self.object_extractor = self.java["ObjectExtractor"](self.document)
+        self.open_file = file
+
+        return self.object_extractor
+
+    def tables_from_page(self, page):
+        output = self.java["StringBuilder"]()
+        self.java["writer"].write(output, self.java["algorithm"].extract(page))
+
+        return tables_from_json(json.loads(str(output.toString())))
+
+    def read_page(self, file, page_number):
+        """
+        Returns the tables on a page of a pdf
+        None is returned if the page does not exist
+        """
+        tables = self.get_cached_page(file, page_number)
+        if tables is not None:
+            return tables
+
+        self.start()
+
+        if not self.is_in_process:
+            self.check_budget()
+            with span("tabula_page", file, page_number):
+                tables = self.read_page_with_subprocess(file, page_number)
+        else:
+            object_extractor = self.open_pdf(file)
+
+            if page_number > self.document.getNumberOfPages():
+                return None
+
+            self.check_budget()
+            with span("tabula_page", file, page_number):
+                tables = self.tables_from_page(object_extractor.extract(page_number))
+
+        if tables is not None:
+            self.page_cache[(file, page_number)] = tables
+
+        return tables
+
+    def check_budget(self):
+        if self.budget is not None:
+            self.budget.check_time()
+
+    @staticmethod
+    def read_page_with_subprocess(file, page_number):
+        try:
+            return tabula.read_pdf(
+                file,
+                pages=str(page_number),
+                pandas_options={"header": 0},
+                force_subprocess=True,
+                **TABULA_OPTIONS,
+            )
+        except subprocess.CalledProcessError:
+            # Page does not exist
+            return None
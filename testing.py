@@ -1,15 +1,21 @@
 import os
+import time
+import errno
+import logging
 import unittest
 from unittest.mock import patch
 import random
 import shutil
+import tempfile
 
 import settings
 from settings import get_full_path, get_full_file_path
 
 from utils import (
+    PdfFile,
     check_ids_correspond,
     get_files_and_ids,
+    get_pdf_file,
     get_previous_ids,
     update_previous_id_database,
 )
@@ -33,6 +39,80 @@ def clear_folder(folder_path):
                 print("Failed to delete %s. Reason: %s" % (file_path, e))
 
 
+def write_text_pdf(path, page_texts):
+    """
+    Writes a pdf with a line of text on each page, with a text layer pypdf can read
+    """
+    num_pages = len(page_texts)
+    page_ids = [4 + 2 * index for index in range(num_pages)]
+
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [{}] /Count {} >>".format(
+            " ".join(f"{page_id} 0 R" for page_id in page_ids), num_pages
+        ),
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for page_id, text in zip(page_ids, page_texts):
+        stream = f"BT /F1 10 Tf 20 700 Td ({text}) Tj ET"
+        objects.append(
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {page_id + 1} 0 R >>"
+        )
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+
+    contents = "%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(contents))
+        contents += f"{number} 0 obj\n{body}\nendobj\n"
+
+    xref_offset = len(contents)
+    contents += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n"
+    contents += "".join(f"{offset:010d} 00000 n \n" for offset in offsets)
+    contents += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\n"
+    contents += f"startxref\n{xref_offset}\n%%EOF\n"
+
+    with open(path, "w") as file:
+        file.write(contents)
+
+
+def extract_in_test_worker(file_and_id, extractor=None):
+    """
+    Stands in for extract_student_tables in the workers of an ExtractionPool
+    Each read of a pdf is written to the pdf. A pdf named hang_*.pdf never finishes, as a
+    call to tabula that never returns.
+    """
+    pdf_file, app_id = file_and_id
+    file = pdf_file.path
+
+    with open(file, "a") as pdf:
+        pdf.write("read\n")
+    logging.warning(f"Read ID: {app_id}")
+
+    if os.path.basename(file).startswith("hang_"):
+        time.sleep(60)
+
+    return file, app_id, [], [], True, None
+
+
+def extract_synthetic_tables(file_and_id, extractor=None):
+    """
+    Stands in for extract_student_tables with synthetic tables, the same for each ID
+    Pdfs take longer or shorter to read depending on their ID, so the workers of a pool
+    finish them out of order
+    """
+    from benchmarks import make_grade_tables
+
+    pdf_file, app_id = file_and_id
+    file = pdf_file.path
+    time.sleep((int(app_id) % 4) * 0.05)
+
+    grade_tables, grade_counters = make_grade_tables(random.Random(int(app_id)))
+
+    return file, app_id, grade_tables, grade_counters, True, None
+
+
 class TestUpdateDatabase(unittest.TestCase):
     def setUp(self) -> None:
         self.output_folder = get_full_path(os.path.join(".", "test_update_database"))
@@ -270,5 +350,1135 @@ class TestIDCorrespondence(unittest.TestCase):
         self.assertSetEqual(correct_ids, set(ids_to_extract))
 
 
+class TestExtractionPool(unittest.TestCase):
+    def test_same_workbook_as_one_worker(self):
+        import openpyxl
+
+        from benchmarks import FM_MAPPING, MATH_MAPPING, PHYS_MAPPING, get_internal_mapping
+        from extracted_students import ExtractedStudents
+        from extraction import ExtractionPool
+        from student import Student
+
+        internal_mapping = get_internal_mapping()
+        applicant_ids = [str(100 + index) for index in range(12)]
+        files = [PdfFile(f"{app_id}.pdf", 0, 0) for app_id in applicant_ids]
+
+        def write_workbook(extracted, folder):
+            # Remainder of the allocation to markers is random
+            random.seed(0)
+            all_students = ExtractedStudents(
+                applicant_ids, MATH_MAPPING, PHYS_MAPPING, FM_MAPPING
+            )
+
+            # Raises an error if a student is added out of order
+            for counter, (file, app_id, grade_tables, grade_counters, *_) in enumerate(
+                extracted
+            ):
+                all_students.add_student_sequentially(
+                    Student(app_id, grade_tables, grade_counters, internal_mapping), counter
+                )
+
+            all_students.write_to_excel(folder)
+            workbook = openpyxl.load_workbook(
+                os.path.join(folder, settings.output_filename)
+            )
+            rows = {
+                sheet.title: list(sheet.iter_rows(values_only=True)) for sheet in workbook
+            }
+
+            return all_students.student_to_marker_mapping, rows
+
+        with tempfile.TemporaryDirectory() as folder, patch.object(
+            settings, "output_path", folder
+        ):
+            utils.check_output_dirs_exist()
+
+            one_worker = write_workbook(
+                map(extract_synthetic_tables, zip(files, applicant_ids)), folder
+            )
+
+            with patch.object(settings, "max_seconds_per_pdf", None):
+                with ExtractionPool(3, extract_synthetic_tables) as pool:
+                    extracted = list(pool.extract_all(zip(files, applicant_ids)))
+
+            self.assertListEqual([app_id for _, app_id, *_ in extracted], applicant_ids)
+            self.assertEqual(write_workbook(extracted, folder), one_worker)
+
+
+class TestQualificationMapping(unittest.TestCase):
+    def test_normalised_once_per_qualification(self):
+        import openpyxl
+        from numpy import nan
+        from pandas import Series
+
+        import mappings
+
+        worksheet = openpyxl.Workbook().active
+        worksheet.append(["United Kingdom: A Levels", "GCE Advanced Level", "A Level"])
+        worksheet.append(["Germany: Abiturprufung", "Abitur"])
+        internal_mapping = utils.read_internal_mapping(worksheet)
+
+        with patch.object(
+            mappings, "normalise_qualification", wraps=mappings.normalise_qualification
+        ) as normalise:
+            # Whitespace and line breaks in a table are ignored
+            self.assertTrue(internal_mapping.is_valid("GCE Advanced\rLevel"))
+            self.assertEqual(
+                internal_mapping.get_internal_name("GCE Advanced\rLevel"),
+                "United Kingdom: A Levels",
+            )
+            self.assertFalse(internal_mapping.is_valid("Baccalaureat General"))
+            self.assertTupleEqual(internal_mapping.resolve(nan), (False, None))
+
+            is_valid, internal_names = internal_mapping.resolve_column(
+                Series(["A Level", nan, "Baccalaureat General", "GCE Advanced\rLevel", "A Level"])
+            )
+
+        # Each qualification is normalised the first time it is seen, and NaN never is
+        self.assertEqual(normalise.call_count, 3)
+        self.assertListEqual(is_valid.tolist(), [True, False, False, True, True])
+        self.assertListEqual(
+            internal_names[is_valid].tolist(), ["United Kingdom: A Levels"] * 3
+        )
+
+
+class TestSubjectCategories(unittest.TestCase):
+    def test_category_of_each_subject(self):
+        from mappings import SubjectCategories
+
+        a_levels = "United Kingdom: A Levels"
+        subject_categories = SubjectCategories(
+            {a_levels: {"Mathematics", "Maths"}},
+            {a_levels: {"Physics", "Maths"}},
+            {a_levels: {"Further Mathematics"}},
+        )
+
+        self.assertEqual(subject_categories.get_category(a_levels, "MATHEMATICS"), "math")
+        # In two sheets => the first, in the order math, physics, fm
+        self.assertEqual(subject_categories.get_category(a_levels, "Maths"), "math")
+        self.assertEqual(subject_categories.get_category(a_levels, "physics"), "physics")
+        self.assertEqual(subject_categories.get_category(a_levels, "Further Mathematics"), "fm")
+        self.assertEqual(
+            subject_categories.get_category(a_levels, "Chemistry"), "additional_subjects"
+        )
+        self.assertEqual(
+            subject_categories.get_category("Germany: Abiturprufung", "Mathematics"),
+            "additional_subjects",
+        )
+
+    def test_same_entries_as_sets_per_entry(self):
+        from benchmarks import (
+            FM_MAPPING,
+            MATH_MAPPING,
+            PHYS_MAPPING,
+            make_students,
+            sort_into_subjects_by_sets,
+        )
+        from extracted_students import ExtractedStudents
+        from mappings import SubjectCategories
+
+        subject_categories = SubjectCategories(MATH_MAPPING, PHYS_MAPPING, FM_MAPPING)
+
+        for student in make_students(50):
+            self.assertDictEqual(
+                ExtractedStudents.sort_into_subjects(student, subject_categories),
+                sort_into_subjects_by_sets(student, MATH_MAPPING, PHYS_MAPPING, FM_MAPPING),
+            )
+
+
+class TestMappingCache(unittest.TestCase):
+    def test_cache_invalidation(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path_to_cache = os.path.join(folder, "mappings.pickle")
+            path_to_first = os.path.join(folder, "first.xlsx")
+            path_to_second = os.path.join(folder, "second.xlsx")
+
+            for path in (path_to_first, path_to_second):
+                with open(path, "wb") as file:
+                    file.write(b"mapping")
+                os.utime(path, ns=(1, 1))
+
+            # Mappings read from a file are its path
+            with patch("utils.read_all_mappings", side_effect=lambda path, _: path) as read:
+                self.assertEqual(utils.load_mappings(path_to_first, path_to_cache), path_to_first)
+                self.assertEqual(utils.load_mappings(path_to_first, path_to_cache), path_to_first)
+                self.assertEqual(read.call_count, 1)
+
+                # Copied => new modification time, same contents
+                os.utime(path_to_first, ns=(2, 2))
+                self.assertEqual(utils.load_mappings(path_to_first, path_to_cache), path_to_first)
+                self.assertEqual(read.call_count, 1)
+
+                # Edited
+                with open(path_to_first, "wb") as file:
+                    file.write(b"edited mapping")
+                self.assertEqual(utils.load_mappings(path_to_first, path_to_cache), path_to_first)
+                self.assertEqual(read.call_count, 2)
+
+                # Same modification time and contents as the cached file, but another file
+                with open(path_to_first, "wb") as file:
+                    file.write(b"mapping")
+                os.utime(path_to_first, ns=(1, 1))
+                utils.load_mappings(path_to_first, path_to_cache)
+                self.assertEqual(
+                    utils.load_mappings(path_to_second, path_to_cache), path_to_second
+                )
+
+
+class TestPageLocator(unittest.TestCase):
+    def test_pages_up_to_exit_table(self):
+        import extraction
+
+        table_headers = "Date Body Exam Subject Grade Result Centre Number"
+        page_texts = [
+            # 1st page isn't searched
+            table_headers,
+            "Personal details",
+            table_headers,
+            "Date Body Exam Level Sitting Subject Grade",
+            extraction.EXIT_STRING,
+            # After the exit table
+            table_headers,
+        ]
+
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "1_unicode_100.pdf")
+
+            write_text_pdf(path, page_texts)
+            self.assertListEqual(extraction.locate_table_pages(path, 2), [3, 4, 5])
+
+            # No exit table => text can't be relied on
+            write_text_pdf(path, page_texts[:4])
+            self.assertIsNone(extraction.locate_table_pages(path, 2))
+
+
+class TestTableCache(unittest.TestCase):
+    def test_least_recently_used_evicted(self):
+        from collections import Counter
+
+        from pandas import DataFrame
+
+        from table_cache import TableCache
+
+        grade_tables = [DataFrame({"Subject": ["Mathematics"], "Grade": ["A"]})]
+        grade_counters = [Counter({"Subject": 1, "Grade": 1})]
+
+        with tempfile.TemporaryDirectory() as folder:
+            table_cache = TableCache(folder, max_bytes=None)
+
+            for time_used, key in enumerate(["a", "b", "c"], 1):
+                table_cache.store(key, grade_tables, grade_counters, True)
+                os.utime(table_cache.get_entry_path(key), (time_used, time_used))
+
+            loaded_tables, loaded_counters, found_exit = table_cache.load("a")
+            self.assertTrue(loaded_tables[0].equals(grade_tables[0]))
+            self.assertListEqual(loaded_counters, grade_counters)
+            self.assertTrue(found_exit)
+
+            # Room for two entries => b, the least recently used, is removed
+            entry_bytes = sum(
+                entry.stat().st_size
+                for entry in os.scandir(table_cache.get_entry_path("a"))
+            )
+            table_cache.max_bytes = 2 * entry_bytes
+            table_cache.evict()
+
+            self.assertIsNone(table_cache.load("b"))
+            self.assertIsNotNone(table_cache.load("a"))
+            self.assertIsNotNone(table_cache.load("c"))
+
+    def test_pdf_hashed_once_while_unchanged(self):
+        import table_cache as table_cache_module
+        from table_cache import TableCache
+
+        with tempfile.TemporaryDirectory() as folder:
+            table_cache = TableCache(os.path.join(folder, "cache"), max_bytes=None)
+
+            path_to_pdf = os.path.join(folder, "1_unicode_100.pdf")
+            with open(path_to_pdf, "wb") as file:
+                file.write(b"%PDF-1.4")
+
+            with patch.object(
+                table_cache_module, "get_file_hash", wraps=table_cache_module.get_file_hash
+            ) as get_file_hash:
+                key = table_cache.make_key(get_pdf_file(path_to_pdf), {"lattice": True})
+                self.assertEqual(
+                    table_cache.make_key(get_pdf_file(path_to_pdf), {"lattice": True}), key
+                )
+                self.assertEqual(get_file_hash.call_count, 1)
+
+                # Extraction output changed => entries written before aren't used
+                with patch.object(table_cache_module, "CACHE_VERSION", 2):
+                    self.assertNotEqual(
+                        table_cache.make_key(get_pdf_file(path_to_pdf), {"lattice": True}),
+                        key,
+                    )
+
+                # Size and modification time changed => read again
+                with open(path_to_pdf, "ab") as file:
+                    file.write(b"\n%%EOF")
+                self.assertNotEqual(
+                    table_cache.make_key(get_pdf_file(path_to_pdf), {"lattice": True}), key
+                )
+                self.assertEqual(get_file_hash.call_count, 2)
+
+
+class TestStudentEntries(unittest.TestCase):
+    def test_entries_of_each_table(self):
+        from numpy import nan
+        from pandas import DataFrame
+
+        from mappings import QualificationMapping, normalise_qualification
+        from pdf_strings import desired_tables, raw_table_headers
+        from student import Student
+
+        achieved, predicted, results = raw_table_headers()
+        internal_mapping = QualificationMapping(
+            {
+                normalise_qualification("GCE Advanced Level"): "United Kingdom: A Levels",
+                normalise_qualification("GCE AS Level"): "United Kingdom: AS Levels",
+                normalise_qualification(
+                    "International Baccalaureate Diploma"
+                ): "World: IB - International Baccalaureate (IB) Diploma",
+            }
+        )
+
+        def module_details(text, num_columns):
+            return ["Module Details/Unit Grades", text] + [nan] * (num_columns - 2)
+
+        modules = (
+            "06-2021 Title: Physics HL Grade: 7H Date: 2021 Title: Chemistry Stand Lvl "
+            "Grade: 5 Date: 2021 Title: Theory of Knowledge Value: 2 Date: 2021"
+        )
+        tables = [
+            DataFrame(
+                [
+                    ["06-2020", "AQA", "GCE Advanced Level", "Mathematics", "A*", nan, 1234],
+                    ["06-2020", "AQA", "Unknown Exam", "Chemistry", "B", nan, 1234],
+                    ["06-2021", "IBO", "International Baccalaureate Diploma", "Physics", "7", nan, 1234],
+                    module_details(modules, len(achieved)),
+                    ["11-2018", "AQA", nan, "Maths", "A", nan, 1234],
+                ],
+                columns=achieved,
+            ),
+            DataFrame(
+                [
+                    ["06-2021", "AQA", "GCE Advanced Level", "Physics", nan, nan, 1234, "A"],
+                    ["06-2021", "AQA", "GCE Advanced Level", "Further Mathematics", "Unnamed: 4", nan, 1234, "A*"],
+                    module_details("06-2021 Title: Mathematics Predicted Grade: 6 Date: 2021", len(predicted)),
+                    ["06-2021", "GCE Advanced Level", nan, "Maths", "B", nan, 1234, "A"],
+                ],
+                columns=predicted,
+            ),
+            DataFrame(
+                [
+                    ["06-2020", "IBO", "GCE AS Level", "June", "Mathematics", 15.5],
+                    ["06-2020", "IBO", "Abitur", "June", "Physik", 1],
+                ],
+                columns=results,
+            ),
+        ]
+
+        student = Student("100", tables, list(desired_tables()), internal_mapping)
+
+        a_levels = "United Kingdom: A Levels"
+        ib = "World: IB - International Baccalaureate (IB) Diploma"
+        # Same entries as when each cell was read by row label
+        expected = {
+            "results": [("United Kingdom: AS Levels", "Mathematics", 15.5, False, "2020", True)],
+            "completed": [
+                (a_levels, "Mathematics", "A*", False, "2020", False),
+                (ib, "Physics", "7", False, "2021", False),
+                (ib, "Physics HL", "7", False, None, False),
+                (ib, "Theory of Knowledge", "2", False, None, False),
+            ],
+            "predicted": [
+                (a_levels, "Physics", "A", True, "2021", False),
+                (a_levels, "Further Mathematics", "A*", True, "2021", False),
+                (a_levels, "Mathematics", "6", True, None, False),
+                (a_levels, "Maths", "B", True, "2021", False),
+            ],
+        }
+
+        for key, entries in student.which_grades.items():
+            self.assertListEqual(
+                [
+                    (
+                        entry.qualification,
+                        entry.subject,
+                        entry.grade,
+                        entry.is_predicted,
+                        entry.year,
+                        entry.is_exam_result,
+                    )
+                    for entry in entries
+                ],
+                expected[key],
+            )
+
+
+class TestEscapeAndIntern(unittest.TestCase):
+    def test_escaped_once_and_shared(self):
+        from grade_entry import GradeEntry, escape_and_intern
+        from utils import escape_backslash_r
+
+        for text in ["Physics\rHL ", "Mathématiques", "Further Mathematics"]:
+            self.assertEqual(escape_and_intern(text), escape_backslash_r(text))
+
+        self.assertIsNone(escape_and_intern(None))
+
+        # Built separately, as each table cell is
+        first = GradeEntry("A Levels", "".join(["Phys", "ics"]), "A", False, "2020", False)
+        second = GradeEntry("A Levels", "".join(["Phy", "sics"]), "B", False, "2021", False)
+        self.assertIs(first.subject, second.subject)
+
+
+class TestOrderPdfs(unittest.TestCase):
+    def test_order_to_target_ids(self):
+        target_ids = [30, 10, 50, 20]
+        pdf_ids = ["20", "40", "10", "50", "60", "30", "10"]
+        pdf_paths = [f"{id}_{i}.pdf" for i, id in enumerate(pdf_ids)]
+
+        with patch("utils.check_ids_correspond", return_value=target_ids):
+            sorted_pdf_paths, ordered_ids = utils.order_pdfs_to_target_id_input(
+                pdf_paths, pdf_ids
+            )
+
+        # Extra IDs removed, repeated IDs kept in the order they were found
+        self.assertListEqual(
+            sorted_pdf_paths,
+            ["30_5.pdf", "10_2.pdf", "10_6.pdf", "50_3.pdf", "20_0.pdf"],
+        )
+        self.assertListEqual(ordered_ids, ["30", "10", "50", "20"])
+
+class TestIndexPdfFolder(unittest.TestCase):
+    def test_duplicates_and_invalid_files(self):
+        filenames = [
+            "b_unicode_200_x.pdf",
+            "a_unicode_100_x.pdf",
+            "c_unicode_100_x.pdf",
+            "a_ascii_300_x.pdf",
+            "a_unicode_400_x.txt",
+        ]
+
+        with tempfile.TemporaryDirectory() as folder:
+            for size, filename in enumerate(filenames):
+                with open(os.path.join(folder, filename), "wb") as file:
+                    file.write(b"0" * size)
+
+            pdf_index = utils.index_pdf_folder(folder)
+
+            # In the order of the file names, the first file of a repeated ID is kept
+            self.assertListEqual(list(pdf_index), ["100", "200"])
+            self.assertEqual(
+                pdf_index["100"].path, os.path.join(folder, "a_unicode_100_x.pdf")
+            )
+            self.assertEqual(pdf_index["100"].size, 1)
+            self.assertEqual(pdf_index["200"].size, 0)
+
+
+class TestIdDatabase(unittest.TestCase):
+    @patch("utils.get_batch_continue_input", return_value="yes")
+    def test_csv_migrated(self, mock_input):
+        import csv
+
+        from id_database import IdDatabase
+
+        with tempfile.TemporaryDirectory() as folder:
+            path_to_csv = os.path.join(folder, "previously_extracted.csv")
+            with open(path_to_csv, "w") as file:
+                writer = csv.writer(file)
+                writer.writerow(settings.database_headers)
+                writer.writerows([[100, 1, "t1"], [200, 1, "t1"], [300, 2, "t2"]])
+
+            path_to_database = os.path.join(folder, "previously_extracted.sqlite")
+
+            batch_number = settings.batch_number
+            settings.batch_number = 3
+            try:
+                self.assertSetEqual(set(get_previous_ids(path_to_database)), {100, 200, 300})
+                update_previous_id_database(path_to_database, [400, 100])
+            finally:
+                settings.batch_number = batch_number
+
+            with IdDatabase(path_to_database) as id_database:
+                self.assertEqual(id_database.get_max_batch_number(), 3)
+                self.assertTupleEqual(
+                    id_database.compare_ids([100, 200, 500]), ({500}, {300, 400})
+                )
+
+    def test_closed_when_batch_number_rejected(self):
+        import sqlite3
+
+        import id_database as id_database_module
+
+        with tempfile.TemporaryDirectory() as folder:
+            path_to_database = os.path.join(folder, "previously_extracted.sqlite")
+            with id_database_module.IdDatabase(path_to_database) as id_database:
+                id_database.add_batch(5, "t5", [100])
+
+            connections = []
+            sqlite_connect = sqlite3.connect
+
+            def connect(*args, **kwargs):
+                connections.append(sqlite_connect(*args, **kwargs))
+                return connections[-1]
+
+            # Batch number less than the largest in the database => raised
+            with patch.object(settings, "batch_number", 4), patch.object(
+                id_database_module.sqlite3, "connect", connect
+            ):
+                self.assertRaises(
+                    utils.InputError, utils.open_previous_id_database, path_to_database
+                )
+
+            self.assertEqual(len(connections), 1)
+            self.assertRaises(sqlite3.ProgrammingError, connections[0].execute, "SELECT 1")
+
+
+class TestFileDistributor(unittest.TestCase):
+    def test_falls_back_to_copy(self):
+        from file_distribution import FileDistributor
+
+        with tempfile.TemporaryDirectory() as folder:
+            source = os.path.join(folder, "1_unicode_100.pdf")
+            with open(source, "wb") as file:
+                file.write(b"%PDF-1.4")
+
+            pool = os.path.join(folder, "pool")
+            os.makedirs(pool)
+
+            # Links not supported => next method is used
+            link_error = OSError(errno.EPERM, "Operation not permitted")
+            with patch("os.link", side_effect=link_error):
+                with FileDistributor("hardlink", 2, 2) as distributor:
+                    distributor.submit(get_pdf_file(source), pool)
+                    distributor.submit(get_pdf_file(source), os.path.join(folder, "0_copy.pdf"))
+
+            for path in (os.path.join(pool, "1_unicode_100.pdf"), os.path.join(folder, "0_copy.pdf")):
+                with open(path, "rb") as file:
+                    self.assertEqual(file.read(), b"%PDF-1.4")
+                self.assertEqual(os.stat(path).st_nlink, 1)
+
+            self.assertNotIn("hardlink_file", distributor.num_placed)
+
+    def test_placed_file_not_placed_again(self):
+        from file_distribution import FileDistributor
+
+        with tempfile.TemporaryDirectory() as folder:
+            source = os.path.join(folder, "1_unicode_100.pdf")
+            with open(source, "wb") as file:
+                file.write(b"%PDF-1.4")
+            destination = os.path.join(folder, "0_copy.pdf")
+
+            # Copy keeps the modification time of the pdf => seen as placed
+            for _ in range(2):
+                with FileDistributor("copy", 1, 1) as distributor:
+                    distributor.submit(get_pdf_file(source), destination)
+
+            self.assertDictEqual(dict(distributor.num_placed), {"already placed": 1})
+
+            # Pdf changed => replaced
+            with open(source, "ab") as file:
+                file.write(b"\n%%EOF")
+            with FileDistributor("copy", 1, 1) as distributor:
+                distributor.submit(get_pdf_file(source), destination)
+
+            self.assertDictEqual(dict(distributor.num_placed), {"copy_file": 1})
+            with open(destination, "rb") as file:
+                self.assertEqual(file.read(), b"%PDF-1.4\n%%EOF")
+
+    def test_other_errors_raised(self):
+        from file_distribution import FileDistributor
+
+        with tempfile.TemporaryDirectory() as folder:
+            source = os.path.join(folder, "1_unicode_100.pdf")
+            with open(source, "wb") as file:
+                file.write(b"%PDF-1.4")
+
+            # Disk full => raised, rather than hidden by falling back to a copy
+            link_error = OSError(errno.ENOSPC, "No space left on device")
+            with patch("os.link", side_effect=link_error):
+                distributor = FileDistributor("hardlink", 1, 1)
+                distributor.submit(get_pdf_file(source), os.path.join(folder, "0_copy.pdf"))
+                self.assertRaises(OSError, distributor.close)
+
+            self.assertDictEqual(distributor.failed_methods, {})
+            self.assertFalse(os.path.exists(os.path.join(folder, "0_copy.pdf")))
+
+    def test_no_clone_without_fcntl(self):
+        import file_distribution
+
+        # As on Windows
+        with patch.object(file_distribution, "fcntl", None), patch.object(
+            file_distribution.os, "copy_file_range", create=True
+        ):
+            methods = file_distribution.get_methods("clone")
+
+        self.assertTupleEqual(
+            methods, (file_distribution.copy_file_range, file_distribution.copy_file)
+        )
+
+
+class TestSnapshotJournal(unittest.TestCase):
+    def test_resume_after_interruption(self):
+        from collections import Counter
+
+        from pandas import DataFrame
+
+        from batch_snapshot import BatchSnapshot
+
+        applicant_ids = ["100", "200", "300"]
+        grade_tables = [DataFrame({"Subject": ["Mathematics"], "Grade": ["A"]})]
+        grade_counters = [Counter({"Subject": 1})]
+
+        with tempfile.TemporaryDirectory() as folder:
+            path_to_snapshot = os.path.join(folder, "snapshot_1")
+
+            with BatchSnapshot(path_to_snapshot) as snapshot:
+                snapshot.start(applicant_ids, {"DA": ["100", "200", "300"]})
+                snapshot.add_student("100", grade_tables, grade_counters, True)
+
+            # Stopped while writing the record of the next applicant
+            with open(os.path.join(path_to_snapshot, "journal.jsonl"), "a") as file:
+                file.write('{"applicant_id": "2')
+
+            with BatchSnapshot(path_to_snapshot) as snapshot:
+                self.assertRaises(ValueError, snapshot.resume, ["100", "300"])
+
+                finished_ids, marker_allocation = snapshot.resume(applicant_ids)
+                self.assertDictEqual(finished_ids, {"100": None})
+                self.assertDictEqual(marker_allocation, {"DA": ["100", "200", "300"]})
+
+                snapshot.add_student("200", grade_tables, grade_counters, False, "Over")
+                self.assertDictEqual(snapshot.read_journal(), {"100": None, "200": "Over"})
+
+                _, _, found_exit = snapshot.load_student("200")
+                self.assertFalse(found_exit)
+
+    def test_retried_applicants_extracted_again(self):
+        from collections import Counter
+
+        from pandas import DataFrame
+
+        from batch_snapshot import BatchSnapshot
+
+        applicant_ids = ["100", "200"]
+        grade_tables = [DataFrame({"Subject": ["Mathematics"], "Grade": ["A"]})]
+        grade_counters = [Counter({"Subject": 1})]
+
+        with tempfile.TemporaryDirectory() as folder:
+            with BatchSnapshot(os.path.join(folder, "snapshot_1")) as snapshot:
+                snapshot.start(applicant_ids, {"DA": applicant_ids})
+                snapshot.add_student("100", grade_tables, grade_counters, True)
+                snapshot.add_student("200", [], [], False, "Over time", retry=True)
+
+                # Issue is still read when rebuilding the workbook
+                self.assertDictEqual(snapshot.read_journal(), {"100": None, "200": "Over time"})
+
+            with BatchSnapshot(os.path.join(folder, "snapshot_1")) as snapshot:
+                finished_ids, _ = snapshot.resume(applicant_ids)
+                self.assertDictEqual(finished_ids, {"100": None})
+
+                snapshot.add_student("200", grade_tables, grade_counters, True)
+                self.assertDictEqual(
+                    snapshot.read_journal(skip_retried=True), {"100": None, "200": None}
+                )
+
+
+class TestTablesFromJson(unittest.TestCase):
+    def test_header_and_values(self):
+        from table_extractor import tables_from_json
+
+        def cells(*texts):
+            return [{"text": text} for text in texts]
+
+        raw_json = [
+            {"data": []},
+            {
+                "data": [
+                    cells("Subject", "Grade", "Grade", "", ""),
+                    cells("Mathematics", "A", "7", "", "x"),
+                    cells("Physics", "", "6", "", "y"),
+                ]
+            },
+        ]
+
+        tables = tables_from_json(raw_json)
+
+        self.assertEqual(len(tables), 1)
+        self.assertListEqual(
+            list(tables[0].columns),
+            ["Subject", "Grade", "Grade.1", "Unnamed: 0", "Unnamed: 1"],
+        )
+        self.assertListEqual(tables[0]["Grade.1"].tolist(), [7, 6])
+        self.assertEqual(tables[0]["Subject"][1], "Physics")
+        self.assertTrue(tables[0]["Grade"].isna()[1])
+
+
+class TestPageCache(unittest.TestCase):
+    def test_each_page_parsed_once(self):
+        from pandas import DataFrame
+
+        from extraction import EXIT_STRING, extract_grade_tables
+        from pdf_strings import raw_table_headers
+        from table_extractor import TableExtractor
+
+        achieved, _, results = raw_table_headers()
+        pages = {
+            # Two target tables => the next page is checked for a broken table twice
+            2: [
+                DataFrame(
+                    [["06-2020", "AQA", "GCE Advanced Level", "Mathematics", "A*", "", 1234]],
+                    columns=achieved,
+                ),
+                DataFrame(
+                    [["06-2020", "AQA", "GCE AS Level", "June", "Physics", "A"]],
+                    columns=results,
+                ),
+            ],
+            3: [DataFrame(columns=[EXIT_STRING])],
+        }
+
+        # As if each page is read by a java process, and not before it is needed
+        extractor = TableExtractor()
+        extractor.is_started = True
+        extractor.is_in_process = False
+
+        with patch.object(settings, "locate_pages_from_text", False), patch.object(
+            TableExtractor,
+            "read_page_with_subprocess",
+            side_effect=lambda file, page_number: pages.get(page_number),
+        ) as read_page:
+            grade_tables, _, found_exit = extract_grade_tables("1_unicode_100.pdf", extractor)
+
+            # Pages of the previous pdf are dropped once another is read
+            extractor.read_page("1_unicode_200.pdf", 2)
+
+        self.assertTrue(found_exit)
+        self.assertEqual(len(grade_tables), 2)
+        self.assertListEqual(
+            [call.args for call in read_page.call_args_list],
+            [("1_unicode_100.pdf", 2), ("1_unicode_100.pdf", 3), ("1_unicode_200.pdf", 2)],
+        )
+        self.assertListEqual(list(extractor.page_cache), [("1_unicode_200.pdf", 2)])
+
+
+class TestPdfBudget(unittest.TestCase):
+    def test_quarantined_over_page_limit(self):
+        import extraction
+
+        class EndlessExtractor:
+            # Every page has no tables and the pdf never ends
+            budget = None
+
+            def read_page(self, file, page_number):
+                return []
+
+        extractor = EndlessExtractor()
+
+        with patch.multiple(
+            settings,
+            use_table_cache=False,
+            locate_pages_from_text=False,
+            max_seconds_per_pdf=None,
+            max_pages_per_pdf=5,
+        ):
+            file, app_id, grade_tables, _, found_exit, issue = extraction.extract_student_tables(
+                (PdfFile("1_unicode_100.pdf", 0, 0), "100"), extractor
+            )
+
+        self.assertEqual(app_id, "100")
+        self.assertListEqual(grade_tables, [])
+        self.assertFalse(found_exit)
+        self.assertEqual(issue, "Quarantined: pdf over 5 pages.")
+        self.assertIsNone(extractor.budget)
+
+    def test_pages_after_exit_table_not_counted(self):
+        from pandas import DataFrame
+        import extraction
+
+        class ExitExtractor:
+            # Exit table on page 4 of a 100 page pdf
+            budget = None
+
+            def read_page(self, file, page_number):
+                if page_number == 4:
+                    return [DataFrame(columns=[extraction.EXIT_STRING])]
+                return []
+
+        with patch.multiple(
+            settings,
+            use_table_cache=False,
+            locate_pages_from_text=False,
+            max_seconds_per_pdf=None,
+            max_pages_per_pdf=3,
+        ):
+            _, _, _, _, found_exit, issue = extraction.extract_student_tables(
+                (PdfFile("1_unicode_100.pdf", 0, 0), "100"), ExitExtractor()
+            )
+
+        self.assertTrue(found_exit)
+        self.assertIsNone(issue)
+
+    def test_hung_pdf_quarantined(self):
+        from extraction import ExtractionPool
+
+        with tempfile.TemporaryDirectory() as folder:
+            names = ["100.pdf", "hang_200.pdf", "300.pdf", "400.pdf"]
+            files = [os.path.join(folder, name) for name in names]
+            for file in files:
+                open(file, "w").close()
+
+            with patch.object(settings, "max_seconds_per_pdf", 1):
+                # Pdfs after the hung one finish before it is quarantined
+                with ExtractionPool(2, extract_in_test_worker) as pool:
+                    with self.assertLogs(level="WARNING") as logs:
+                        extracted = list(
+                            pool.extract_all(
+                                zip(map(get_pdf_file, files), ["100", "200", "300", "400"])
+                            )
+                        )
+
+            self.assertListEqual(
+                [app_id for _, app_id, *_ in extracted], ["100", "200", "300", "400"]
+            )
+            self.assertListEqual(
+                [issue for *_, issue in extracted],
+                [None, "Quarantined: pdf over 1 s.", None, None],
+            )
+
+            # Finished results are kept when the pool is replaced => each pdf is read once
+            for file in files:
+                with open(file) as pdf:
+                    self.assertEqual(pdf.read(), "read\n")
+
+            # Records of the workers are logged by this process
+            self.assertIn("WARNING:root:Read ID: 300", logs.output)
+            self.assertIn("200, time limit hit", " ".join(logs.output))
+
+    def test_one_worker_run_in_pool_with_time_limit(self):
+        from contextlib import nullcontext
+
+        from extraction import ExtractionPool, get_extraction_pool
+
+        with patch.object(settings, "max_seconds_per_pdf", None):
+            self.assertIsInstance(get_extraction_pool(1), nullcontext)
+
+        with patch.object(settings, "max_seconds_per_pdf", 1):
+            with get_extraction_pool(1) as pool:
+                self.assertIsInstance(pool, ExtractionPool)
+
+
+class TestResume(unittest.TestCase):
+    def test_finished_batch_resumed(self):
+        import argparse
+
+        import openpyxl
+
+        import extract_table
+        import extraction
+        from batch_snapshot import BatchSnapshot
+        from benchmarks import (
+            FM_MAPPING,
+            MATH_MAPPING,
+            PHYS_MAPPING,
+            get_internal_mapping,
+            make_grade_tables,
+        )
+
+        time_issue = extraction.get_quarantine_issue("time")
+        extracted_ids = []
+
+        def extract_all_students(all_files, applicant_ids, extractor, num_workers):
+            rng = random.Random(0)
+            for pdf_file, app_id in zip(all_files, applicant_ids):
+                file = pdf_file.path
+                extracted_ids.append(app_id)
+                grade_tables, grade_counters = make_grade_tables(rng)
+
+                # Slow the first time it is read, e.g. as the machine was busy
+                if app_id == "200" and extracted_ids.count(app_id) == 1:
+                    yield file, app_id, [], [], False, time_issue
+                else:
+                    yield file, app_id, grade_tables, grade_counters, True, None
+
+        with tempfile.TemporaryDirectory() as folder:
+            path_to_pdfs = os.path.join(folder, "pdfs")
+            os.makedirs(path_to_pdfs)
+            for app_id in ["100", "200", "300"]:
+                with open(os.path.join(path_to_pdfs, f"a_unicode_{app_id}_x.pdf"), "w") as file:
+                    file.write(app_id)
+
+            path_to_database = os.path.join(folder, "previously_extracted.sqlite")
+            path_to_snapshot = os.path.join(folder, "snapshot_1")
+
+            with patch.multiple(
+                settings,
+                batch_number=1,
+                base_directory=folder,
+                output_path=folder,
+                path_to_pdfs_to_extract=path_to_pdfs,
+                path_to_pdf_pool=os.path.join(folder, "pool"),
+                path_to_snapshot=path_to_snapshot,
+                path_to_quarantine=os.path.join(folder, "quarantine_1.csv"),
+                path_to_database_of_extracted_pdfs=path_to_database,
+                terminate_if_batch_num_repeated=True,
+                report_subject_names=False,
+                use_table_cache=False,
+                record_timings=False,
+            ), patch.object(extract_table, "initialise_logger"), patch.object(
+                extract_table,
+                "load_mappings",
+                return_value=(get_internal_mapping(), MATH_MAPPING, PHYS_MAPPING, FM_MAPPING),
+            ), patch.object(
+                extraction, "extract_all_students", extract_all_students
+            ):
+                with patch.object(
+                    extract_table,
+                    "order_pdfs_to_target_id_input",
+                    side_effect=lambda all_files, applicant_ids: (all_files, applicant_ids),
+                ):
+                    extract_table.main(argparse.Namespace(workers=1, resume=False))
+
+                # Batch has finished => its IDs are in the database, so it can't be checked
+                # against the database again
+                self.assertRaises(
+                    utils.InputError, utils.open_previous_id_database, path_to_database
+                )
+
+                with patch.object(
+                    extract_table, "order_pdfs_to_target_id_input"
+                ) as order_pdfs:
+                    extract_table.main(argparse.Namespace(workers=1, resume=True))
+
+                order_pdfs.assert_not_called()
+
+            # Only the pdf over the time allowed is read again
+            self.assertListEqual(extracted_ids, ["100", "200", "300", "200"])
+            self.assertDictEqual(
+                BatchSnapshot(path_to_snapshot).read_journal(),
+                {"100": None, "200": None, "300": None},
+            )
+
+            workbook = openpyxl.load_workbook(os.path.join(folder, "grades_1.xlsx"))
+            compiled = list(workbook["Compiled"].iter_rows(min_row=2, values_only=True))
+            self.assertListEqual([row[0] for row in compiled], ["100", "200", "300"])
+            self.assertNotIn(time_issue, str(compiled[1][2]))
+
+
+class TestPipeline(unittest.TestCase):
+    def test_stage_bounded_and_in_order(self):
+        from pipeline import run_in_background
+
+        produced = []
+
+        def produce():
+            for item in range(20):
+                produced.append(item)
+                yield item
+
+        consumed = []
+        for item in run_in_background(produce(), 2):
+            # Slower than the stage before it => the stage waits on the full queue
+            time.sleep(0.01)
+            # Queued items, the one being put and the one just yielded
+            self.assertLessEqual(len(produced) - len(consumed), 4)
+            consumed.append(item)
+
+        self.assertListEqual(consumed, list(range(20)))
+
+    def test_error_raised_in_caller(self):
+        from pipeline import run_in_background
+
+        def produce():
+            yield "100"
+            yield "200"
+            raise ValueError("Table could not be read")
+
+        consumed = []
+        with self.assertRaises(ValueError):
+            for item in run_in_background(produce(), 1):
+                consumed.append(item)
+
+        self.assertListEqual(consumed, ["100", "200"])
+
+
+class TestCombinedMode(unittest.TestCase):
+    def test_subject_names_counted_from_tables_of_students(self):
+        from unittest.mock import MagicMock
+
+        from benchmarks import get_internal_mapping, make_grade_tables
+        from extract_table import build_students
+        from subject_names import SubjectNameTally
+
+        internal_mapping = get_internal_mapping()
+        rng = random.Random(0)
+        # File, ID, tables, header counters, found exit, issue, finished before
+        extracted = [
+            (f"{app_id}.pdf", app_id, *make_grade_tables(rng), True, None, False)
+            for app_id in ["100", "200", "300"]
+        ]
+
+        # Counted on their own, as by extract_subject_names.py
+        separate = SubjectNameTally(internal_mapping)
+        for _, _, grade_tables, grade_counters, *_ in extracted:
+            separate.add_tables(grade_tables, grade_counters)
+
+        combined = SubjectNameTally(internal_mapping)
+        students = list(build_students(extracted, MagicMock(), combined, internal_mapping))
+
+        self.assertListEqual(
+            [student.unique_id for _, student, _ in students], ["100", "200", "300"]
+        )
+        self.assertGreater(sum(combined.math_totals.values()), 0)
+        for names in ("math_names", "phys_names", "fm_names", "math_totals", "phys_totals", "fm_totals"):
+            self.assertDictEqual(getattr(combined, names), getattr(separate, names))
+
+
+class TestWriteOnlyWorkbook(unittest.TestCase):
+    def test_rows_of_each_sheet(self):
+        import openpyxl
+        from numpy import nan
+        from pandas import DataFrame
+
+        from benchmarks import FM_MAPPING, MATH_MAPPING, PHYS_MAPPING, get_internal_mapping
+        from extracted_students import ExtractedStudents
+        from pdf_strings import desired_tables, raw_table_headers
+        from student import Student
+
+        achieved, predicted, results = raw_table_headers()
+        tables = [
+            DataFrame(
+                [
+                    ["06-2021", "AQA", "GCE Advanced Level", "Mathematics", "A*", nan, 1234],
+                    ["06-2021", "AQA", "GCE Advanced Level", "Physics", "A", nan, 1234],
+                    ["06-2021", "AQA", "GCE Advanced Level", "Chemistry", "B", nan, 1234],
+                ],
+                columns=achieved,
+            ),
+            DataFrame(
+                [["06-2022", "AQA", "GCE Advanced Level", "Further Mathematics", nan, nan, 1234, "A"]],
+                columns=predicted,
+            ),
+            DataFrame(columns=results),
+        ]
+        student = Student("100", tables, list(desired_tables()), get_internal_mapping())
+
+        with tempfile.TemporaryDirectory() as folder, patch.object(
+            settings, "output_path", folder
+        ):
+            utils.check_output_dirs_exist()
+
+            all_students = ExtractedStudents(["100"], MATH_MAPPING, PHYS_MAPPING, FM_MAPPING)
+            all_students.add_import_issue("100", "Quarantined: pdf over 5 pages.")
+            all_students.add_student_sequentially(student, 0)
+            self.assertTrue(all_students.get_workbook().write_only)
+            all_students.write_to_excel(folder)
+
+            workbook = openpyxl.load_workbook(os.path.join(folder, settings.output_filename))
+            rows = {sheet.title: list(sheet.iter_rows(values_only=True)) for sheet in workbook}
+
+        # Same sheets, in the same order, as when the cells were written one at a time
+        self.assertListEqual(
+            workbook.sheetnames,
+            ["Compiled", "Sheet", "Completed Qualifications", "Predicted Grades", "Exam Results"],
+        )
+        self.assertTupleEqual(
+            rows["Completed Qualifications"][1],
+            ("100", "United Kingdom: A Levels", "Mathematics", "A*", "Physics", "A", "Chemistry", "B", None, None),
+        )
+        self.assertTupleEqual(
+            rows["Predicted Grades"][1][:4],
+            ("100", "United Kingdom: A Levels", "Further Mathematics", "A"),
+        )
+
+        compiled = dict(zip(range(1, 16), rows["Compiled"][1]))
+        self.assertEqual(compiled[3], "Quarantined: pdf over 5 pages.")
+        self.assertTupleEqual((compiled[5], compiled[6]), ("A*", "A"))
+        self.assertEqual(compiled[11], "Yes")
+        # Filled in from the grades of the row, before it is appended
+        self.assertEqual(compiled[12], "A*AAB")
+
+
+class TestLazyStartup(unittest.TestCase):
+    def run_python(self, *arguments):
+        import subprocess
+        import sys
+
+        return subprocess.run(
+            [sys.executable, *arguments],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+
+    def test_import_does_no_work(self):
+        import json
+
+        # Folders that would be created are recorded instead
+        output = self.run_python(
+            "-c",
+            "import json, os, sys\n"
+            "made = []\n"
+            "os.makedirs = lambda *args, **kwargs: made.append(args)\n"
+            "import settings, utils, extract_table, extract_subject_names, rebuild_workbook\n"
+            "heavy = ['pandas', 'numpy', 'tabula', 'openpyxl', 'jpype']\n"
+            "print(json.dumps([[name for name in heavy if name in sys.modules], made]))",
+        )
+
+        self.assertListEqual(json.loads(output), [[], []])
+
+    def test_help_without_loading_batch(self):
+        output = self.run_python("extract_table.py", "--help")
+
+        self.assertIn("--resume", output)
+
+
+class TestTimings(unittest.TestCase):
+    def test_report(self):
+        from timing import Timings
+
+        timings = Timings()
+        for page, seconds in enumerate([0.5, 1.5, 1.0], 1):
+            timings.add("tabula_page", seconds, "a.pdf", page)
+        timings.add("tabula_page", 0.25, "b.pdf", 1)
+        timings.add("extract_pdf", 3.0, "a.pdf")
+        timings.add("extract_pdf", 0.25, "b.pdf")
+        timings.add("build_student", 0.1, "a.pdf")
+        timings.add("build_student", 0.1, "b.pdf")
+
+        report = timings.get_report()
+
+        self.assertEqual(report["num_pages"], 4)
+        self.assertEqual(report["num_applicants"], 2)
+        self.assertDictEqual(
+            report["stages"]["tabula_page"],
+            {"count": 4, "total_seconds": 3.25, "mean_seconds": 0.8125, "max_seconds": 1.5},
+        )
+        self.assertListEqual(
+            report["slowest_documents"],
+            [
+                {"file": "a.pdf", "seconds": 3.0, "pages": 3},
+                {"file": "b.pdf", "seconds": 0.25, "pages": 1},
+            ],
+        )
+
+    def test_worker_starts_without_spans(self):
+        import extraction
+        from timing import timings
+
+        # As inherited by a forked worker
+        timings.add("tabula_page", 1.0, "a.pdf", 2)
+        root_logger = logging.getLogger()
+        with patch.object(root_logger, "handlers", []), patch.object(
+            root_logger, "level", root_logger.level
+        ):
+            extraction.init_worker(None)
+
+        self.assertListEqual(timings.drain(), [])
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,151 @@
+"""
+    Contains the timing spans recorded around each stage of a run, and its performance report
+"""
+
+import os
+import csv
+import json
+import time
+import threading
+
+from collections import defaultdict
+from contextlib import contextmanager
+
+import settings
+
+# Number of documents listed in the report as the slowest
+NUM_SLOWEST_DOCUMENTS = 10
+
+# Header of the CSV report, one row per span
+SPAN_FIELDS = ("stage", "seconds", "file", "page")
+
+
+class Timings:
+    """
+    Class that collects the time spent in each stage of a run
+
+    A span is a stage with its duration, and the file and page it was for, if any.
+    Spans can be recorded from any thread. Worker processes have their own Timings,
+    whose spans are sent back with their results and added with extend.
+    """
+
+    def __init__(self):
+        self.spans = []
+        self.lock = threading.Lock()
+        self.start_time = time.perf_counter()
+
+    def restart(self):
+        """
+        Removes the spans recorded so far, and times the run from now
+        """
+        with self.lock:
+            self.spans = []
+            self.start_time = time.perf_counter()
+
+    def add(self, stage, seconds, file=None, page=None):
+        with self.lock:
+            self.spans.append((stage, seconds, file, page))
+
+    def extend(self, spans):
+        with self.lock:
+            self.spans += spans
+
+    def drain(self):
+        """
+        Returns the spans recorded so far and removes them
+        """
+        with self.lock:
+            spans, self.spans = self.spans, []
+        return spans
+
+    def get_report(self):
+        """
+        Returns the summary of the spans: pages per second, time per applicant, the slowest
+        documents and the time in each stage
+        """
+        with self.lock:
+            spans = list(self.spans)
+
+        elapsed = time.perf_counter() - self.start_time
+
+        stages = defaultdict(list)
+        pages_per_file = defaultdict(int)
+        for stage, seconds, file, _ in spans:
+            stages[stage].append(seconds)
+            if stage == "tabula_page":
+                pages_per_file[file] += 1
+
+        documents = [
+            (seconds, file) for stage, seconds, file, _ in spans if stage == "extract_pdf"
+        ]
+        documents.sort(reverse=True)
+
+        num_pages = len(stages.get("tabula_page", ()))
+        num_applicants = len(stages.get("build_student", ()))
+
+        return {
+            "batch_number": settings.batch_number,
+            "elapsed_seconds": elapsed,
+            "num_applicants": num_applicants,
+            "num_pages": num_pages,
+            "pages_per_second": num_pages / elapsed if elapsed else None,
+            "seconds_per_applicant": elapsed / num_applicants if num_applicants else None,
+            # Stages run at the same time in different threads and processes
+            # => their totals can add up to more than elapsed_seconds
+            "stages": {
+                stage: {
+                    "count": len(durations),
+                    "total_seconds": sum(durations),
+                    "mean_seconds": sum(durations) / len(durations),
+                    "max_seconds": max(durations),
+                }
+                for stage, durations in sorted(stages.items())
+            },
+            "slowest_documents": [
+                {"file": file, "seconds": seconds, "pages": pages_per_file[file]}
+                for seconds, file in documents[:NUM_SLOWEST_DOCUMENTS]
+            ],
+        }
+
+    def write_report(self, path_to_json, path_to_csv):
+        """
+        Writes the summary to a json file, and every span to a CSV file
+        """
+        with open(path_to_json, "w") as file:
+            json.dump(self.get_report(), file, indent=4)
+
+        with self.lock:
+            spans = list(self.spans)
+
+        with open(path_to_csv, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(SPAN_FIELDS)
+            writer.writerows(spans)
+
+
+# Spans of this process
+timings = Timings()
+
+# Another thread may hold the lock when a worker is forked => the worker gets its own
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(
+        after_in_child=lambda: setattr(timings, "lock", threading.Lock())
+    )
+
+
+@contextmanager
+def span(stage, file=None, page=None):
+    """
+    Records the time spent in the block as a span of the stage,
+        with span("tabula_page", file, page_number):
+            tables = ...
+    """
+    if not settings.record_timings:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(stage, time.perf_counter() - start, file, page)
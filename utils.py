@@ -1,19 +1,18 @@
 import os
 import logging
-import csv
-import shutil
+import pickle
 
+from collections import namedtuple
 from time import localtime, strftime
 from copy import deepcopy
 from random import randint
 
-import tabula
-import numpy as np
-from pandas import read_excel, Series
-
 import settings
 
 from pdf_strings import detail_string
+from mappings import QualificationMapping, normalise_qualification
+
+# numpy and pandas are imported where they are used, so importing utils stays quick
 
 
 class InputError(Exception):
@@ -43,22 +42,17 @@ def initialise_logger():
     logging.info("Start")
 
 
-def get_internal_mapping(path_to_file, sheet_name):
+def check_mapping_file(path_to_file):
     if not path_to_file.endswith(".xlsx"):
         logging.error("Mapping file not in xlsx format")
         raise InputError(
             'not path_to_file.endswith(".xlsx")', "Input file must be in xlsx format"
         )
 
-    input_file = path_to_file
-
-    from openpyxl import load_workbook
-
-    wb = load_workbook(filename=input_file, read_only=True)
-    ws = wb[sheet_name]
 
+def read_internal_mapping(ws):
     # Maps values in columns after 2nd to value in 1st column
-    output_dict = dict()
+    output_dict = QualificationMapping()
 
     for row in ws.rows:
         val = None
@@ -68,27 +62,12 @@ def get_internal_mapping(path_to_file, sheet_name):
                 val = cell.value
             elif cell.value is not None:
                 # Other values is what we have
-                output_dict[''.join(e for e in str(cell.value) if e.isprintable() and not e.isspace())] = val
-
-    logging.info("Mapping file loaded")
+                output_dict[normalise_qualification(cell.value)] = val
 
     return output_dict
 
 
-def get_subject_mapping(path_to_file, sheet_name):
-    if not path_to_file.endswith(".xlsx"):
-        logging.error("Mapping file not in xlsx format")
-        raise InputError(
-            'not path_to_file.endswith(".xlsx")', "Input file must be in xlsx format"
-        )
-
-    input_file = path_to_file
-
-    from openpyxl import load_workbook
-
-    wb = load_workbook(filename=input_file, read_only=True)
-    ws = wb[sheet_name]
-
+def read_subject_mapping(ws):
     # Maps values in columns after 2nd to value in 1st column
     output_dict = dict()
 
@@ -106,12 +85,141 @@ def get_subject_mapping(path_to_file, sheet_name):
     return output_dict
 
 
-def is_file_valid(file):
-    if file.endswith(".pdf") and "unicode" in file:
-        return True
+def get_internal_mapping(path_to_file, sheet_name):
+    check_mapping_file(path_to_file)
+
+    input_file = path_to_file
+
+    from openpyxl import load_workbook
+
+    wb = load_workbook(filename=input_file, read_only=True)
+    output_dict = read_internal_mapping(wb[sheet_name])
+    wb.close()
+
+    logging.info("Mapping file loaded")
+
+    return output_dict
+
+
+def get_subject_mapping(path_to_file, sheet_name):
+    check_mapping_file(path_to_file)
+
+    input_file = path_to_file
+
+    from openpyxl import load_workbook
+
+    wb = load_workbook(filename=input_file, read_only=True)
+    output_dict = read_subject_mapping(wb[sheet_name])
+    wb.close()
+
+    return output_dict
+
+
+def read_all_mappings(path_to_file, sheet_names):
+    """
+    Reads the qualification, maths, physics and further maths mappings, in that order,
+    opening the mapping file once
+    """
+    check_mapping_file(path_to_file)
+
+    from openpyxl import load_workbook
+
+    wb = load_workbook(filename=path_to_file, read_only=True)
+
+    internal_sheet, *subject_sheets = sheet_names
+    mappings = [read_internal_mapping(wb[internal_sheet])]
+    mappings += [read_subject_mapping(wb[sheet_name]) for sheet_name in subject_sheets]
+
+    wb.close()
+
+    return tuple(mappings)
+
+
+def load_mappings(path_to_file=None, path_to_cache=None):
+    """
+    Returns the qualification, maths, physics and further maths mappings, in that order
+
+    The mappings are saved to a cache file after being read from the mapping file.
+    The cache is used for the same mapping file (and sheets) while its modification time
+    is unchanged or, if it has changed (e.g. the file was copied), while its contents are
+    the same.
+    Set use_mapping_cache = False in settings.py to always read the mapping file.
+    """
+    if path_to_file is None:
+        path_to_file = settings.path_to_mapping_file
+    if path_to_cache is None and settings.use_mapping_cache:
+        path_to_cache = settings.path_to_mapping_cache
+
+    sheet_names = (
+        settings.qualification_mapping_sheet_name,
+        settings.maths_mapping_sheet_name,
+        settings.physics_mapping_sheet_name,
+        settings.further_maths_mapping_sheet_name,
+    )
+
+    if path_to_cache is None:
+        mappings = read_all_mappings(path_to_file, sheet_names)
+        logging.info("Mapping file loaded")
+        return mappings
+
+    from table_cache import get_file_hash
+
+    # Another mapping file may have the same modification time and contents
+    key = (os.path.realpath(path_to_file), sheet_names)
+    modification_time = os.stat(path_to_file).st_mtime_ns
+
+    cached = None
+    if os.path.exists(path_to_cache):
+        try:
+            with open(path_to_cache, "rb") as file:
+                cached = pickle.load(file)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError) as error:
+            logging.warning(f"Mapping cache could not be read: {error}")
+
+    if cached is not None and cached.get("key") == key:
+        if cached["modification_time"] == modification_time:
+            logging.info("Mapping file loaded from cache")
+            return cached["mappings"]
+
+        # Hash is only needed if the file may have changed
+        file_hash = get_file_hash(path_to_file)
+        if cached["file_hash"] == file_hash:
+            logging.info("Mapping file loaded from cache")
+            cached["modification_time"] = modification_time
+            write_mapping_cache(path_to_cache, cached)
+            return cached["mappings"]
     else:
-        logging.info(f"{file} is not valid. Unicode or .pdf not in file name")
-        return False
+        file_hash = get_file_hash(path_to_file)
+
+    mappings = read_all_mappings(path_to_file, sheet_names)
+    logging.info("Mapping file loaded")
+
+    write_mapping_cache(
+        path_to_cache,
+        {
+            "key": key,
+            "modification_time": modification_time,
+            "file_hash": file_hash,
+            "mappings": mappings,
+        },
+    )
+
+    return mappings
+
+
+def write_mapping_cache(path_to_cache, contents):
+    # Written to a temporary file first, so a partial cache is never read
+    temporary_path = path_to_cache + ".tmp"
+    try:
+        with open(temporary_path, "wb") as file:
+            pickle.dump(contents, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, path_to_cache)
+    except OSError as error:
+        logging.warning(f"Mapping cache could not be written: {error}")
+
+
+def is_file_valid(file):
+    return file.endswith(".pdf") and "unicode" in file
 
 
 def is_abs_path(input_path):
@@ -174,8 +282,9 @@ def is_database_path_valid():
 
     _, ext = os.path.splitext(settings.database_name)
 
-    if ext != ".csv":
-        raise InputError(True, "Database file MUST be a .csv")
+    # A .csv database is migrated to a .sqlite database next to it
+    if ext not in {".sqlite", ".csv"}:
+        raise InputError(True, "Database file MUST be a .sqlite or .csv")
 
     return True
 
@@ -203,23 +312,27 @@ def handle_banner_and_database_permutations(ids_from_database):
         logging.warning(msg)
 
 
-def get_ids_from_database():
-    if settings.is_id_file_banner:
-        if not is_database_path_valid():
-            return None
+def get_id_database():
+    """
+    Returns the database of previously extracted IDs, or None if there are none
+    """
+    if not settings.is_id_file_banner or not is_database_path_valid():
+        return None
 
-        ids_from_database = get_previous_ids(
-            settings.path_to_database_of_extracted_pdfs
-        )
-        # print(ids_from_database)
-        handle_banner_and_database_permutations(ids_from_database)
-    else:
-        ids_from_database = None
+    id_database = open_previous_id_database(settings.path_to_database_of_extracted_pdfs)
+
+    if id_database is None:
+        handle_banner_and_database_permutations(None)
+        return None
 
-    return ids_from_database
+    handle_banner_and_database_permutations(id_database)
+
+    return id_database
 
 
 def get_data_from_target_file():
+    from pandas import read_excel
+
     if settings.is_id_file_banner:
         data_from_sheet = read_excel(
             settings.path_to_target_file,
@@ -249,17 +362,16 @@ def check_ids_correspond(ids_from_pdf_folder):
     # Convert to set to allow for obtain desired set
     ids_from_pdf_folder = set(ids_from_pdf_folder)
     ids_from_target_file = set(ids_from_target_file)
-    ids_from_database = get_ids_from_database()
+    id_database = get_id_database()
 
-    if ids_from_database is not None:
-        ids_from_database = set(ids_from_database)
+    if id_database is not None:
+        # Set differences are queried on the indexed IDs of the database
+        with id_database:
+            # New IDs are defined as IDs in target file but not in database
+            new_ids, not_in_target = id_database.compare_ids(ids_from_target_file)
 
-        # print(ids_from_target_file)
-        # print(ids_from_pdf_folder)
-        # print(ids_from_database)
-
-        if ids_from_target_file < ids_from_database:
-            not_in_target = ids_from_database - ids_from_target_file
+        # Target IDs are a proper subset of database IDs
+        if not new_ids and not_in_target:
             # not_in_target = list(not_in_target)
             not_in_target = ", ".join([str(item) for item in list(not_in_target)])
             msg = (
@@ -288,9 +400,6 @@ def check_ids_correspond(ids_from_pdf_folder):
             print(msg)
             logging.warning(msg)
 
-        # New IDs are defined as IDs in target file but not in database
-        new_ids = ids_from_target_file - ids_from_database
-
         if not new_ids:
             raise InputError("not new_ids", "TERMINATE: No new IDs")
 
@@ -346,40 +455,59 @@ def check_ids_correspond(ids_from_pdf_folder):
             raise InputError("ids_from_target_file != intersection", msg)
 
 def remove_extra_pdfs(target_ids, pdf_paths, pdf_ids):
+    """
+    Keeps only the pdfs whose ID is in target_ids
+    """
+    target_ids = set(target_ids)
 
-    not_in_target = list(set(pdf_ids) - set(target_ids))
-    extra_locs = [np.argwhere(np.asarray(pdf_ids) == id) for id in not_in_target]
+    is_kept = [id in target_ids for id in pdf_ids]
 
-    filtered_pdf_ids = [pdf_ids[i] for i in range(0, len(pdf_ids)) if i not in extra_locs]
-    filtered_pdf_paths = [pdf_paths[i] for i in range(0, len(pdf_paths)) if i not in extra_locs]
+    filtered_pdf_ids = [id for id, kept in zip(pdf_ids, is_kept) if kept]
+    filtered_pdf_paths = [path for path, kept in zip(pdf_paths, is_kept) if kept]
 
-    return (filtered_pdf_paths, filtered_pdf_ids) 
+    return (filtered_pdf_paths, filtered_pdf_ids)
 
-def order_pdfs_to_target_id_input(all_pdf_paths, ids_from_all_pdfs):
 
+def order_pdfs_to_target_id_input(all_pdf_paths, ids_from_all_pdfs):
     # Perform check to see if IDs from PDFs and target IDs correspond
-    target_ids = check_ids_correspond(ids_from_all_pdfs)
+    target_ids = list(check_ids_correspond(ids_from_all_pdfs))
 
-    # Convert to numpy array to get argwhere to work
-    if isinstance(target_ids, list):
-        target_ids = np.asarray(target_ids)
-    else:
-        target_ids = np.asarray(list(target_ids))
+    return order_pdfs_to_ids(all_pdf_paths, ids_from_all_pdfs, target_ids)
+
+
+def order_pdfs_to_snapshot_ids(all_pdf_paths, ids_from_all_pdfs, snapshot_ids):
+    """
+    Orders the pdfs to the IDs of a batch being resumed, as stored in its snapshot
+
+    The IDs were checked against the target file and database when the batch was started.
+    Once the batch has finished, the database holds them as well, so they aren't checked
+    against it again
+    """
+    missing_ids = {int(item) for item in snapshot_ids} - {
+        int(item) for item in ids_from_all_pdfs
+    }
+    if missing_ids:
+        missing_ids = ", ".join([str(item) for item in sorted(missing_ids)])
+        msg = f"Following ID(s) of the batch being resumed but PDF not found: {missing_ids}"
+        logging.error(msg)
+        raise InputError("not ids_from_all_pdfs.issuperset(snapshot_ids)", msg)
+
+    return order_pdfs_to_ids(all_pdf_paths, ids_from_all_pdfs, snapshot_ids)
 
-    if not isinstance(ids_from_all_pdfs, list):
-        ids_from_all_pdfs = list(ids_from_all_pdfs)
 
+def order_pdfs_to_ids(all_pdf_paths, ids_from_all_pdfs, target_ids):
     # Enforced type being integer for comparison
+    target_ids = [int(item) for item in target_ids]
     ids_from_all_pdfs = [int(item) for item in ids_from_all_pdfs]
     # Remove extra pdfs from list
     all_pdf_paths, ids_from_all_pdfs = remove_extra_pdfs(target_ids, all_pdf_paths, ids_from_all_pdfs)
 
-    # Location of ID from pdfs in target ids list
-    id_locs = [
-        np.argwhere(target_ids == current_id).item()
-        for current_id in ids_from_all_pdfs
-        if current_id in target_ids
-    ]
+    # Location of each ID in target ids list, the first if it is repeated
+    target_locs = dict()
+    for loc, target_id in enumerate(target_ids):
+        target_locs.setdefault(target_id, loc)
+
+    id_locs = [target_locs[current_id] for current_id in ids_from_all_pdfs]
 
     # Sort list based on id_locs, then extract the paths from it
     sorted_pdf_paths = [
@@ -387,12 +515,15 @@ def order_pdfs_to_target_id_input(all_pdf_paths, ids_from_all_pdfs):
         for _, path in sorted(zip(id_locs, all_pdf_paths), key=lambda pair: pair[0])
     ]
 
-    target_ids = [str(item) for item in target_ids.tolist()]
+    target_ids = [str(item) for item in target_ids]
 
     return sorted_pdf_paths, target_ids
 
 
-def copy_file(path_to_file, extracted_students_instance, id_num):
+def get_marker_file_path(path_to_file, extracted_students_instance, id_num):
+    """
+    Path the pdf of a student is placed at in the folder of its marker
+    """
     marker_details = extracted_students_instance.student_to_marker_mapping.get(id_num)
 
     if marker_details is not None:
@@ -408,78 +539,103 @@ def copy_file(path_to_file, extracted_students_instance, id_num):
     original_filename = os.path.basename(path_to_file)
 
     new_filename = str(numbering) + "_" + original_filename
-    path_to_new_dir = os.path.join(settings.output_path, marker_name, new_filename)
+    return os.path.join(settings.output_path, marker_name, new_filename)
 
-    shutil.copy(path_to_file, path_to_new_dir)
 
+# size  => in bytes
+# mtime => time of the last modification, in seconds since the epoch
+PdfFile = namedtuple("PdfFile", ["path", "size", "mtime"])
 
-def copy_pdfs_to_pool(all_pdf_paths):
-    output_path = settings.path_to_pdf_pool
-    for file in all_pdf_paths:
-        shutil.copy(file, output_path)
 
+def get_pdf_file(path_to_file):
+    """
+    PdfFile of a single pdf, for a pdf that isn't in an indexed folder
+    """
+    stat = os.stat(path_to_file)
+    return PdfFile(path_to_file, stat.st_size, stat.st_mtime)
 
-def get_files_and_ids(abs_path):
 
-    # Test if path is absolute
-    is_abs_path(abs_path)
+def get_pdf_id(filename):
+    return filename.split(settings.pdf_filename_split_delimeter)[
+        settings.pdf_filename_split_index
+    ]
 
-    logging.info("Assembling list of files to analyse...")
 
-    # Remove duplicates in files
-    # BUT doesn't address repeated IDs
-    lst_of_paths = list(
-        set(
-            [
-                os.path.join(abs_path, file)
-                for file in os.listdir(abs_path)
-                if is_file_valid(file)
-            ]
-        )
-    )
+def index_pdf_folder(abs_path):
+    """
+    Returns a dict of the ID of each valid pdf in the folder to its PdfFile, in the order
+    of the file names
 
-    # Extract IDs from file names
-    lst_of_ids = [
-        os.path.basename(file).split(settings.pdf_filename_split_delimeter)[
-            settings.pdf_filename_split_index
-        ]
-        for file in lst_of_paths
-    ]
+    The folder is read once with os.scandir, which gives the size and modification time
+    of each file without opening it. If several files have the same ID, the first in
+    the order of the file names is kept.
+    """
 
-    num_files = len(lst_of_paths)
-    logging.info(f"Total of {num_files} files")
-    print(f"Total of {num_files} files in {settings.path_to_pdfs_to_extract}")
+    # Test if path is absolute
+    is_abs_path(abs_path)
 
-    # If all are unique, then no issues
-    if len(lst_of_ids) == len(set(lst_of_ids)):
-        logging.info("No duplicate files")
-        print("No duplicate files")
-        return lst_of_paths, lst_of_ids
+    with os.scandir(abs_path) as entries:
+        entries = sorted(entries, key=lambda entry: entry.name)
 
-    # If there are repetitions, remove it from the lsit of IDs and paths
-    counter = 1
+    pdf_index = dict()
+    num_invalid = 0
     num_repetitions = 0
-    for unique_id in lst_of_ids[1:]:
-        if unique_id in lst_of_ids[:counter]:
+
+    for entry in entries:
+        if not is_file_valid(entry.name) or not entry.is_file():
+            logging.debug(f"{entry.name} is not valid. Unicode or .pdf not in file name")
+            num_invalid += 1
+            continue
+
+        unique_id = get_pdf_id(entry.name)
+
+        if unique_id in pdf_index:
             logging.info(
-                f"Duplicate file present for {unique_id}, file {lst_of_paths[counter]} removed"
+                f"Duplicate file present for {unique_id}, file {entry.path} removed"
             )
-            lst_of_ids.pop(counter)
-            lst_of_paths.pop(counter)
             num_repetitions += 1
-        else:
-            counter += 1
+            continue
+
+        stat = entry.stat()
+        pdf_index[unique_id] = PdfFile(entry.path, stat.st_size, stat.st_mtime)
+
+    if num_invalid:
+        logging.info(f"{num_invalid} files are not valid. Unicode or .pdf not in file name")
+
+    if num_repetitions:
+        logging.info(f"Total of {num_repetitions} repeated files removed")
+        print(f"Total of {num_repetitions} repeated files excluded")
+        print("Check log for details")
+    else:
+        logging.info("No duplicate files")
+        print("No duplicate files")
+
+    return pdf_index
+
+
+def get_files_and_ids(abs_path):
+    """
+    Returns the PdfFile of each valid pdf in the folder and the ID of each
+
+    The size and modification time are kept with the path, so the table cache and the
+    placing of the pdfs don't have to read the files again to check them
+    """
+    logging.info("Assembling list of files to analyse...")
+
+    pdf_index = index_pdf_folder(abs_path)
+
+    lst_of_files = list(pdf_index.values())
+    lst_of_ids = list(pdf_index)
 
-    logging.info(f"Total of {num_repetitions} repeated files removed")
-    print(f"Total of {num_repetitions} repeated files excluded")
-    print("Check log for details")
+    num_files = len(lst_of_files)
+    logging.info(f"Total of {num_files} files")
+    print(f"Total of {num_files} files in {settings.path_to_pdfs_to_extract}")
 
-    return lst_of_paths, lst_of_ids
+    return lst_of_files, lst_of_ids
 
 
-def check_batch_num_against_database(past_batch_nums, is_same_then_terminate=False):
+def check_batch_num_against_database(prev_max_batch_num, is_same_then_terminate=False):
     # Check and get user input on whether to continue based on batch number
-    prev_max_batch_num = max(past_batch_nums)
     print(
         f"Current batch number: {settings.batch_number}\t"
         + f"Largest previous batch number: {prev_max_batch_num}"
@@ -512,103 +668,68 @@ def get_batch_continue_input(prev_max_batch_num):
         raise Exception
 
 
-def read_database_file(database_path):
-    database_ids = []
-    past_batch_nums = set()
+def open_previous_id_database(database_path):
+    """
+    Returns the database of previously extracted IDs, after checking the batch number
+    against it, or None if there is no database or it is empty
+    """
+    from id_database import IdDatabase, get_database_paths
 
-    with open(database_path, "r") as database_file:
-        database_reader = csv.DictReader(database_file, delimiter=",")
+    if not any(os.path.exists(path) for path in get_database_paths(database_path)):
+        return None
 
-        # Put past ids into list, other information is for human
-        for row in database_reader:
-            row_id = row.get(
-                settings.database_headers[settings.database_header_id_num_index]
-            )
-            if row_id is not None:
-                database_ids.append(int(row_id))
-            else:
-                raise Exception("Database file has been corrupted")
+    id_database = IdDatabase(database_path)
 
-            row_batch_num = row.get(
-                settings.database_headers[settings.database_header_batch_index]
-            )
-            if row_batch_num is not None:
-                past_batch_nums.add(int(row_batch_num))
-            else:
-                raise Exception("Database file has been corrupted")
+    # The database is only returned open if every check passes
+    try:
+        if id_database.is_empty():
+            id_database.close()
+            return None
 
         check_batch_num_against_database(
-            past_batch_nums,
+            id_database.get_max_batch_number(),
             is_same_then_terminate=settings.terminate_if_batch_num_repeated,
         )
+    except BaseException:
+        id_database.close()
+        raise
 
-    return database_ids
+    return id_database
 
 
 def get_previous_ids(database_path):
-    if os.path.exists(database_path):
-        database_ids = read_database_file(database_path)
-        # Return None if list is empty
-        if database_ids:
-            return database_ids
-        else:
-            return None
-    else:
+    id_database = open_previous_id_database(database_path)
+
+    # Return None if there are no previous IDs
+    if id_database is None:
         return None
 
+    with id_database:
+        return id_database.get_ids()
+
 
 def get_current_time():
     return strftime("%Y-%m-%d %H:%M", localtime())
 
 
 def update_previous_id_database(database_path, new_ids):
-    if os.path.exists(database_path):
-        is_existing_file = True
-        open_mode = "a"
-    else:
-        is_existing_file = False
-        open_mode = "w"
+    from id_database import IdDatabase
 
     timestamp = strftime("%Y-%m-%d %H:%M", localtime())
 
-    with open(database_path, open_mode) as database_file:
-        database_writer = csv.DictWriter(
-            database_file, fieldnames=settings.database_headers, delimiter=","
-        )
-
-        if not is_existing_file:
-            database_writer.writeheader()
-
-        for id_num in new_ids:
-            database_writer.writerow(
-                {
-                    settings.database_headers[
-                        settings.database_header_id_num_index
-                    ]: id_num,
-                    settings.database_headers[
-                        settings.database_header_batch_index
-                    ]: settings.batch_number,
-                    settings.database_headers[
-                        settings.database_header_timestamp_index
-                    ]: timestamp,
-                }
-            )
+    with IdDatabase(database_path) as id_database:
+        id_database.add_batch(settings.batch_number, timestamp, new_ids)
 
 
-def check_broken_table(current_page_number, filename, current_table):
+def check_broken_table(current_page_number, filename, current_table, extractor):
     """
     Determines if a table continues onto the next page
     If it does, return a the data in a form that can be appended to the original table
     """
 
     # Extract tables from next page
-    tables = tabula.read_pdf(
-        filename,
-        pages=str(current_page_number + 1),
-        lattice=True,
-        guess=True,
-        pandas_options={"header": 0},
-    )
+    # The extractor caches pages, so this page is not parsed again when it is reached
+    tables = extractor.read_page(filename, current_page_number + 1)
 
     if not tables:
         return None
@@ -623,6 +744,8 @@ def check_broken_table(current_page_number, filename, current_table):
     if top_table.empty:
         table_length = len(top_table_header)
         if table_length == current_table_length:
+            from pandas import Series
+
             return Series(top_table_header.values, index=current_table_header)
         elif detail_string() in top_table_header:
             return move_data_out_of_header(
@@ -654,9 +777,11 @@ def move_data_out_of_header(top_table, cur_table_header, table_length):
     return pdDF(top_table.values, columns=cur_table_header[:table_length])
 
 
-def fix_broken_table(current_page_number, current_table, filename):
+def fix_broken_table(current_page_number, current_table, filename, extractor):
 
-    continued_values = check_broken_table(current_page_number, filename, current_table)
+    continued_values = check_broken_table(
+        current_page_number, filename, current_table, extractor
+    )
 
     if continued_values is not None:
         # add new row to end of DataFrame